@@ -0,0 +1,237 @@
+"""
+Index local des aéroports et villes (codes IATA)
+
+Source : data/airports.csv (sous-ensemble au format OurAirports, enrichi
+des noms français et variantes courantes). L'index compact est construit
+une fois puis rechargé par pickle :
+
+    python airport_index.py --build
+    python airport_index.py --import-ourairports airports.csv   # compléter depuis OurAirports
+    python airport_index.py Fès marakech Paris
+"""
+import bisect
+import csv
+import difflib
+import os
+import pickle
+import re
+import sys
+import threading
+import unicodedata
+from functools import lru_cache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CSV_PATH = os.path.join(DATA_DIR, "airports.csv")
+INDEX_PATH = os.path.join(DATA_DIR, "airports.idx.pickle")
+
+FIELDS = ["iata", "city", "city_aliases", "airport_name", "airport_aliases", "country"]
+
+# Similarité minimale pour accepter une faute de frappe ("marakech")
+FUZZY_CUTOFF = 0.8
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    """
+    "Fès " -> "fes", "Saint-Denis" -> "saint denis"
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+    return text.strip()
+
+# ========================================
+# CONSTRUCTION
+# ========================================
+
+def build_index(csv_path=CSV_PATH):
+    """
+    CSV -> index compact : noms triés + codes associés (tableaux parallèles)
+    """
+    city_codes = {}
+    city_names = {}
+    names = {}
+    airports = {}
+
+    with open(csv_path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            code = row["iata"].strip().upper()
+            city = normalize(row["city"])
+            airports[code] = (row["city"], row["airport_name"], row["country"])
+
+            # L'ordre du fichier = priorité (Paris -> CDG, ORY, BVA)
+            city_codes.setdefault(city, []).append(code)
+            city_names.setdefault(city, {city}).update(
+                normalize(a) for a in row["city_aliases"].split("|") if a.strip()
+            )
+
+            # Noms propres à l'aéroport -> ce seul code
+            for alias in [row["airport_name"], *row["airport_aliases"].split("|")]:
+                alias = normalize(alias)
+                if alias:
+                    names.setdefault(alias, (code,))
+            names[normalize(code)] = (code,)
+
+    for city, aliases in city_names.items():
+        for alias in aliases:
+            names[alias] = tuple(city_codes[city])
+
+    keys = sorted(names)
+    return {
+        "keys": keys,
+        "values": [names[k] for k in keys],
+        "airports": airports
+    }
+
+
+def save_index(index, path=INDEX_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_index():
+    """
+    Index chargé une seule fois ; reconstruit si le CSV est plus récent
+    """
+    global _index
+
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is not None:
+            return _index
+
+        index = None
+        if os.path.exists(INDEX_PATH) and os.path.getmtime(INDEX_PATH) >= os.path.getmtime(CSV_PATH):
+            try:
+                with open(INDEX_PATH, "rb") as f:
+                    index = pickle.load(f)
+            except Exception as e:
+                print(f"❌ Index aéroports illisible, reconstruction : {e}")
+
+        if index is None:
+            index = build_index()
+            try:
+                save_index(index)
+            except OSError as e:
+                print(f"❌ Impossible d'écrire {INDEX_PATH} : {e}")
+
+        index["exact"] = dict(zip(index["keys"], index["values"]))
+
+        # Candidats aux fautes de frappe, par première lettre
+        index["by_initial"] = {}
+        for key in index["keys"]:
+            index["by_initial"].setdefault(key[0], []).append(key)
+
+        _index = index
+        return _index
+
+# ========================================
+# RECHERCHE
+# ========================================
+
+@lru_cache(maxsize=4096)
+def get_airport_codes(city):
+    """
+    Tous les aéroports d'une ville, par priorité : "Paris" -> ("CDG", "ORY", "BVA").
+    Insensible aux accents, tolère préfixes et fautes ("marakech"). () si inconnu.
+    """
+    query = normalize(city)
+    if not query:
+        return ()
+
+    index = load_index()
+
+    codes = index["exact"].get(query)
+    if codes:
+        return codes
+
+    if len(query) < 4:
+        return ()
+
+    # Préfixe non ambigu ("marrak", "bruxel" -> "bruxelles" plutôt que "bruxelles charleroi")
+    keys = index["keys"]
+    i = bisect.bisect_left(keys, query)
+    if i < len(keys) and keys[i].startswith(query):
+        first = keys[i]
+        j = i + 1
+        while j < len(keys) and keys[j].startswith(query):
+            if not keys[j].startswith(first) and index["values"][j] != index["values"][i]:
+                break
+            j += 1
+        else:
+            return index["values"][i]
+
+    # Faute de frappe : même initiale, longueur voisine
+    candidates = [k for k in index["by_initial"].get(query[0], ()) if abs(len(k) - len(query)) <= 2]
+    match = difflib.get_close_matches(query, candidates, n=1, cutoff=FUZZY_CUTOFF)
+    if match:
+        return index["exact"][match[0]]
+
+    return ()
+
+
+def get_airport(code):
+    """
+    (ville, nom aéroport, pays) pour un code IATA, ou None
+    """
+    return load_index()["airports"].get(code.upper())
+
+# ========================================
+# IMPORT OURAIRPORTS
+# ========================================
+
+def import_ourairports(source, csv_path=CSV_PATH):
+    """
+    Ajoute au CSV les aéroports commerciaux d'un export OurAirports
+    (https://ourairports.com/data/airports.csv) absents du fichier
+    """
+    with open(csv_path, encoding="utf-8") as f:
+        known = {row["iata"] for row in csv.DictReader(f)}
+
+    added = 0
+    with open(source, encoding="utf-8") as src, open(csv_path, "a", encoding="utf-8", newline="") as dst:
+        writer = csv.DictWriter(dst, fieldnames=FIELDS)
+        for row in csv.DictReader(src):
+            code = (row.get("iata_code") or "").strip().upper()
+            if (
+                len(code) != 3 or code in known
+                or row.get("type") not in ("large_airport", "medium_airport")
+                or row.get("scheduled_service") != "yes"
+                or not row.get("municipality")
+            ):
+                continue
+
+            writer.writerow({
+                "iata": code,
+                "city": row["municipality"],
+                "city_aliases": "",
+                "airport_name": row["name"],
+                "airport_aliases": "",
+                "country": row["iso_country"]
+            })
+            known.add(code)
+            added += 1
+
+    return added
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if args[:1] == ["--import-ourairports"]:
+        print(f"✅ {import_ourairports(args[1])} aéroports ajoutés")
+        args = ["--build"]
+
+    if args[:1] == ["--build"]:
+        index = build_index()
+        save_index(index)
+        print(f"✅ Index : {len(index['keys'])} noms, {len(index['airports'])} aéroports -> {INDEX_PATH}")
+    else:
+        for city in args:
+            print(f"{city} -> {', '.join(get_airport_codes(city)) or '?'}")
@@ -1,24 +1,81 @@
 import os
-import requests
-from datetime import datetime
+import asyncio
+import threading
+import time
+import http_transport
+from cache import TTLCache
+from http_transport import run_sync
+from metrics import span
+from resilience import map_in_context
+from singleflight import SingleFlight
+from flight_offers import dedupe_offers, format_flights, parse_offers, rank_offers
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import date, timedelta
 
-class AmadeusAPI:
+# AMADEUS_BASE_URL : autre environnement (production, serveur local des benchmarks)
+AMADEUS_BASE_URL = os.getenv("AMADEUS_BASE_URL", "https://test.api.amadeus.com").rstrip("/")
+TOKEN_URL = f"{AMADEUS_BASE_URL}/v1/security/oauth2/token"
+
+# Rafraîchir le token N secondes avant son expiration
+TOKEN_REFRESH_MARGIN = int(os.getenv("AMADEUS_TOKEN_REFRESH_MARGIN", "60"))
+
+class AmadeusTokenManager:
     """
-    Interface pour Amadeus Flight API
+    Token OAuth Amadeus partagé par toutes les instances et tous les threads
     """
     
-    def __init__(self):
-        self.api_key = os.getenv("AMADEUS_API_KEY")
-        self.api_secret = os.getenv("AMADEUS_API_SECRET")
-        self.base_url = "https://test.api.amadeus.com/v2"
-        self.token = None
+    def __init__(self, api_key, api_secret, token_url=TOKEN_URL, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        self._timer = None
     
     def get_token(self):
         """
-        Obtenir token d'authentification
+        Retourne le token en cache, ou en demande un nouveau s'il a expiré
         """
-        url = "https://test.api.amadeus.com/v1/security/oauth2/token"
+        token = self.cached_token()
+        if token:
+            return token
         
+        with self._lock:
+            # Un autre thread a pu rafraîchir pendant l'attente du verrou
+            if self._token and time.monotonic() < self._expires_at:
+                return self._token
+            return self._fetch()
+    
+    def cached_token(self):
+        """
+        Token encore valide, sans appel réseau (None sinon)
+        """
+        token = self._token
+        if token and time.monotonic() < self._expires_at:
+            return token
+        return None
+    
+    def refresh(self, stale_token=None):
+        """
+        Force un nouveau token (après un 401).
+        Si un autre thread a déjà remplacé stale_token, on réutilise le sien.
+        """
+        with self._lock:
+            if stale_token and self._token and self._token != stale_token:
+                return self._token
+            # Token refusé par Amadeus : inutilisable même s'il n'a pas expiré
+            self._token = None
+            self._expires_at = 0.0
+            return self._fetch()
+    
+    def _fetch(self):
+        """
+        Appel OAuth (verrou déjà acquis). En cas d'échec, le token courant
+        et son expiration restent en place.
+        """
         data = {
             "grant_type": "client_credentials",
             "client_id": self.api_key,
@@ -26,80 +83,480 @@ class AmadeusAPI:
         }
         
         try:
-            response = requests.post(url, data=data)
-            response.raise_for_status()
-            self.token = response.json()["access_token"]
-            return True
+            with span("amadeus_token"):
+                response = http_transport.post(self.token_url, upstream="amadeus", data=data)
+                response.raise_for_status()
+            payload = response.json()
         except Exception as e:
             print(f"❌ Erreur authentification : {e}")
-            return False
+            return None
+        
+        expires_in = int(payload.get("expires_in", 1799))
+        self._token = payload["access_token"]
+        self._expires_at = time.monotonic() + expires_in
+        self._schedule_refresh(expires_in - self.refresh_margin)
+        return self._token
     
-    def search_flights(self, origin, destination, departure_date, return_date=None, adults=1, max_results=5):
+    def _schedule_refresh(self, delay):
         """
-        Recherche vols réels
+        Programme le rafraîchissement proactif en arrière-plan
         """
-        if not self.token:
-            if not self.get_token():
-                return None
-        
-        url = f"{self.base_url}/shopping/flight-offers"
+        if self._timer:
+            self._timer.cancel()
         
+        self._timer = threading.Timer(max(delay, 1), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _background_refresh(self):
+        with self._lock:
+            if self._fetch() is None and time.monotonic() < self._expires_at:
+                # Échec : on garde l'ancien token et on réessaie plus tard
+                self._schedule_refresh(min(30, self._expires_at - time.monotonic()))
+
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+def get_token_manager(api_key, api_secret):
+    """
+    Un gestionnaire de token par jeu d'identifiants pour tout le processus
+    """
+    key = (api_key, api_secret)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None:
+            manager = AmadeusTokenManager(api_key, api_secret)
+            _token_managers[key] = manager
+        return manager
+
+
+# ========================================
+# CACHE DES RECHERCHES DE VOLS
+# ========================================
+
+FLIGHT_CACHE_TTL = int(os.getenv("FLIGHT_CACHE_TTL", "600"))
+FLIGHT_CACHE_SIZE = int(os.getenv("FLIGHT_CACHE_SIZE", "512"))
+FLIGHT_CACHE_FILE = os.getenv("FLIGHT_CACHE_FILE")
+
+# Amadeus en panne : des prix vieux d'une heure valent mieux qu'aucun résultat
+FLIGHT_STALE_TTL = int(os.getenv("FLIGHT_STALE_TTL", "3600"))
+
+# Même requête déjà en vol (rafale d'utilisateurs sur la même promo) : une seule requête Amadeus
+flight_requests = SingleFlight("amadeus")
+
+flight_cache = TTLCache(maxsize=FLIGHT_CACHE_SIZE, ttl=FLIGHT_CACHE_TTL, path=FLIGHT_CACHE_FILE, stale_ttl=FLIGHT_STALE_TTL)
+
+def stale_offers(key):
+    """
+    Amadeus injoignable : dernières offres connues, même expirées (ou None)
+    """
+    offers = flight_cache.get_stale(key)
+    if offers is not None:
+        print(f"⚠️ Amadeus dégradé : offres en cache servies pour {key[0]}-{key[1]} {key[2]}")
+    return offers
+
+
+def flight_cache_key(origin, destination, departure_date, return_date=None, adults=1, currency="EUR", max_results=5):
+    """
+    Clé normalisée : "cmn " et "CMN" donnent la même entrée
+    """
+    return (
+        origin.strip().upper(),
+        destination.strip().upper(),
+        str(departure_date).strip(),
+        str(return_date).strip() if return_date else None,
+        int(adults),
+        currency.strip().upper(),
+        int(max_results)
+    )
+
+
+# ========================================
+# DATES FLEXIBLES
+# ========================================
+
+# Requêtes Amadeus simultanées max pour un calendrier de prix :
+# ±3 jours aller-retour = 7 x 7 cases, en une seule vague
+FLEX_MAX_CONCURRENCY = int(os.getenv("FLEX_MAX_CONCURRENCY", "49"))
+
+# Cases du calendrier : disjoncteur à part et pas de hedging. Une rafale
+# limitée par Amadeus (429) n'ouvre pas le disjoncteur des recherches principales.
+CALENDAR_UPSTREAM = "amadeus_calendar"
+
+def flexible_date_pairs(center_date, return_date=None, window=3):
+    """
+    Combinaisons (départ, retour) autour des dates demandées (± window jours).
+    Les dates passées et les retours avant le départ sont ignorés.
+    """
+    today = date.today()
+    center = date.fromisoformat(center_date)
+    offsets = range(-window, window + 1)
+    
+    departures = [center + timedelta(days=d) for d in offsets]
+    departures = [d for d in departures if d >= today]
+    
+    if not return_date:
+        return [(d.isoformat(), None) for d in departures]
+    
+    back = date.fromisoformat(return_date)
+    returns = [back + timedelta(days=d) for d in offsets]
+    
+    return [
+        (dep.isoformat(), ret.isoformat())
+        for dep in departures
+        for ret in returns
+        if ret >= dep
+    ]
+
+def build_price_calendar(pairs, results):
+    """
+    Matrice compacte {(départ, retour): prix min} + case la moins chère
+    """
+    prices = {}
+    
+    for pair, offers in zip(pairs, results):
+        prices[pair] = min((o.price for o in offers or ()), default=None)
+    
+    priced = [(price, pair) for pair, price in prices.items() if price is not None]
+    cheapest = min(priced) if priced else None
+    
+    return {
+        "departure_dates": sorted({dep for dep, _ in pairs}),
+        "return_dates": sorted({ret for _, ret in pairs if ret}),
+        "prices": prices,
+        "cheapest": {"departure_date": cheapest[1][0], "return_date": cheapest[1][1], "price": cheapest[0]} if cheapest else None
+    }
+
+def format_price_calendar(calendar):
+    """
+    Calendrier des prix lisible sur WhatsApp (⭐ = moins cher)
+    """
+    cheapest = calendar["cheapest"]
+    if not cheapest:
+        return "❌ Aucun vol trouvé sur ces dates"
+    
+    best = (cheapest["departure_date"], cheapest["return_date"])
+    short = lambda iso: f"{iso[8:10]}/{iso[5:7]}"
+    
+    def cell(pair):
+        price = calendar["prices"].get(pair)
+        if price is None:
+            return "   -  "
+        mark = "⭐" if pair == best else " "
+        return f"{price:5.0f}{mark}"
+    
+    text = "📅 CALENDRIER DES PRIX (€)\n\n"
+    
+    if not calendar["return_dates"]:
+        for dep in calendar["departure_dates"]:
+            text += f"{short(dep)}  {cell((dep, None))}\n"
+    else:
+        text += f"{'Aller/Ret':<10} " + " ".join(f"{short(r)} " for r in calendar["return_dates"]) + "\n"
+        for dep in calendar["departure_dates"]:
+            row = " ".join(cell((dep, ret)) for ret in calendar["return_dates"])
+            text += f"{short(dep):<10} {row}\n"
+    
+    text += f"\n⭐ Meilleur prix : {cheapest['price']:.0f}€ le {short(cheapest['departure_date'])}"
+    if cheapest["return_date"]:
+        text += f" → {short(cheapest['return_date'])}"
+    
+    return text
+
+
+# ========================================
+# PLUSIEURS AÉROPORTS
+# ========================================
+
+# Requêtes simultanées max pour une recherche multi-aéroports
+MULTI_MAX_CONCURRENCY = int(os.getenv("MULTI_MAX_CONCURRENCY", "9"))
+
+# Pool partagé des fan-out synchrones (multi-aéroports, calendrier)
+_amadeus_executor = ThreadPoolExecutor(max_workers=int(os.getenv("AMADEUS_WORKERS", "64")), thread_name_prefix="amadeus")
+
+def airport_pairs(origins, destinations):
+    """
+    Produit cartésien (origine, destination), sans doublon ni aller vers soi-même
+    """
+    origins = list(dict.fromkeys(origins))
+    destinations = list(dict.fromkeys(destinations))
+    return [(o, d) for o in origins for d in destinations if o != d]
+
+
+def merge_offers(results):
+    """
+    Résultats par paire d'aéroports -> offres dédupliquées, None si tout a échoué
+    """
+    answered = [offers for offers in results if offers is not None]
+    if not answered:
+        return None
+    return dedupe_offers(o for offers in answered for o in offers)
+
+
+class _AmadeusClient:
+    """
+    Logique commune aux clients synchrone et asynchrone, écrite une seule fois
+    en coroutines : cache, single-flight, repli sur le cache expiré, nouvel
+    essai après un 401, fan-out multi-aéroports et calendrier des prix.
+    
+    Chaque client fournit son transport : _token_ready, _refresh_token, _send,
+    _single_flight et _gather.
+    """
+    
+    def __init__(self):
+        self.api_key = os.getenv("AMADEUS_API_KEY")
+        self.api_secret = os.getenv("AMADEUS_API_SECRET")
+        self.base_url = f"{AMADEUS_BASE_URL}/v2"
+        self.tokens = get_token_manager(self.api_key, self.api_secret)
+        self.token = None
+    
+    def _offers_params(self, origin, destination, departure_date, return_date, adults, currency, max_results):
         params = {
             "originLocationCode": origin,
             "destinationLocationCode": destination,
             "departureDate": departure_date,
             "adults": adults,
             "max": max_results,
-            "currencyCode": "EUR"
+            "currencyCode": currency
         }
         
         if return_date:
             params["returnDate"] = return_date
         
-        headers = {
+        return params
+    
+    def _auth_headers(self):
+        return {
             "Authorization": f"Bearer {self.token}"
         }
+    
+    def format_flights(self, offers):
+        """
+        Formate les offres en texte lisible
+        """
+        return format_flights(offers)
+    
+    async def _search_flights(self, origin, destination, departure_date, return_date=None, adults=1, max_results=5, currency="EUR", sort_by="price", max_price=None):
+        offers = await self._search_offers(origin, destination, departure_date, return_date, adults, max_results, currency)
+        if offers is None:
+            return None
+        
+        return self.format_flights(rank_offers(offers, by=sort_by, k=3, max_price=max_price))
+    
+    async def _search_flights_multi(self, origins, destinations, departure_date, return_date=None, adults=1, max_results=5, currency="EUR", sort_by="price", max_price=None):
+        offers = await self._search_multi_offers(origins, destinations, departure_date, return_date, adults, max_results, currency)
+        if offers is None:
+            return None
+        
+        return self.format_flights(rank_offers(offers, by=sort_by, k=3, max_price=max_price))
+    
+    async def _search_multi_offers(self, origins, destinations, departure_date, return_date=None, adults=1, max_results=5, currency="EUR", max_workers=MULTI_MAX_CONCURRENCY):
+        pairs = airport_pairs(origins, destinations)
+        if len(pairs) == 1:
+            return await self._search_offers(*pairs[0], departure_date, return_date, adults, max_results, currency)
+        if not pairs:
+            return None
+        
+        # Token obtenu une fois avant le fan-out
+        if not await self._token_ready():
+            return None
+        
+        results = await self._gather([
+            partial(self._search_offers, origin, destination, departure_date, return_date, adults, max_results, currency)
+            for origin, destination in pairs
+        ], max_workers)
+        
+        return merge_offers(results)
+    
+    async def _search_offers(self, origin, destination, departure_date, return_date=None, adults=1, max_results=5, currency="EUR", upstream="amadeus"):
+        key = flight_cache_key(origin, destination, departure_date, return_date, adults, currency, max_results)
+        
+        offers = flight_cache.get(key)
+        if offers is not None:
+            return offers
+        
+        return await self._single_flight(key, self._fetch_offers, key, upstream)
+    
+    async def _fetch_offers(self, key, upstream="amadeus"):
+        offers = await self._request_offers(*key, upstream=upstream)
+        if offers is not None:
+            flight_cache.set(key, offers)
+            return offers
+        
+        return stale_offers(key)
+    
+    async def _search_flexible(self, origin, destination, center_date, return_date=None, window=3, adults=1, currency="EUR", max_workers=FLEX_MAX_CONCURRENCY):
+        pairs = flexible_date_pairs(center_date, return_date, window)
+        if not pairs:
+            return build_price_calendar([], [])
+        
+        # Token obtenu une fois avant le fan-out
+        if not await self._token_ready():
+            return None
+        
+        results = await self._gather([
+            partial(self._search_offers, origin, destination, departure, back, adults, currency=currency, upstream=CALENDAR_UPSTREAM)
+            for departure, back in pairs
+        ], max_workers)
+        
+        return build_price_calendar(pairs, results)
+    
+    async def _request_offers(self, *key, upstream="amadeus"):
+        """
+        Appel HTTP flight-offers (sans cache)
+        """
+        hedge = upstream != CALENDAR_UPSTREAM
+        if not await self._token_ready():
+            return None
+        
+        url = f"{self.base_url}/shopping/flight-offers"
+        params = self._offers_params(*key)
         
         try:
-            response = requests.get(url, headers=headers, params=params)
+            with span("amadeus_search"):
+                response = await self._send("GET", url, upstream=upstream, hedge=hedge, headers=self._auth_headers(), params=params)
+            
+            # Token révoqué ou expiré côté serveur : un seul nouvel essai
+            if response.status_code == 401:
+                self.token = await self._refresh_token()
+                if not self.token:
+                    return None
+                with span("amadeus_search", retry="401"):
+                    response = await self._send("GET", url, upstream=upstream, hedge=hedge, headers=self._auth_headers(), params=params)
+            
             response.raise_for_status()
-            return self.format_flights(response.json())
+            # Parsé une fois : la réponse brute n'est pas conservée
+            return parse_offers(response.json())
         except Exception as e:
             print(f"❌ Erreur recherche vols : {e}")
             return None
+
+
+class AmadeusAPI(_AmadeusClient):
+    """
+    Interface pour Amadeus Flight API
     
-    def format_flights(self, data):
+    Transport bloquant (requests, threads pour le fan-out) : les coroutines
+    communes ne s'interrompent jamais et s'exécutent sans boucle (run_sync)
+    """
+    
+    def get_token(self):
         """
-        Formate résultats API en texte lisible
+        Obtenir token d'authentification (partagé, mis en cache)
         """
-        if not data.get("data"):
-            return "❌ Aucun vol trouvé"
-        
-        flights_text = "✈️ VOLS TROUVÉS :\n\n"
+        self.token = self.tokens.get_token()
+        return self.token is not None
+    
+    def search_flights(self, *args, **kwargs):
+        """
+        Recherche vols réels (3 meilleures offres selon sort_by, sous max_price)
+        """
+        return run_sync(self._search_flights(*args, **kwargs))
+    
+    def search_flights_multi(self, *args, **kwargs):
+        """
+        Comme search_flights, sur tous les aéroports des deux villes (CDG, ORY, BVA...)
+        """
+        return run_sync(self._search_flights_multi(*args, **kwargs))
+    
+    def search_multi_offers(self, *args, **kwargs):
+        """
+        Offres de toutes les paires d'aéroports, en parallèle (durée ~ la requête la plus lente)
+        """
+        return run_sync(self._search_multi_offers(*args, **kwargs))
+    
+    def search_offers(self, *args, **kwargs):
+        """
+        Offres Amadeus (tuple de FlightOffer), servies depuis le cache si possible
+        """
+        return run_sync(self._search_offers(*args, **kwargs))
+    
+    def search_flexible(self, *args, **kwargs):
+        """
+        Calendrier des prix ± window jours (requêtes en parallèle, bornées)
+        """
+        return run_sync(self._search_flexible(*args, **kwargs))
+    
+    async def _token_ready(self):
+        return self.get_token()
+    
+    async def _refresh_token(self):
+        return self.tokens.refresh(self.token)
+    
+    async def _send(self, method, url, **kwargs):
+        return http_transport.request(method, url, **kwargs)
+    
+    async def _single_flight(self, key, fn, *args):
+        return flight_requests.do(key, lambda: run_sync(fn(*args)))
+    
+    async def _gather(self, calls, max_workers):
+        return map_in_context(_amadeus_executor, lambda call: run_sync(call()), calls, limit=max_workers)
+
+
+class AsyncAmadeusAPI(_AmadeusClient):
+    """
+    Version asyncio de AmadeusAPI (même format de retour) : requêtes sur la
+    session aiohttp partagée, fan-out en tâches plutôt qu'en threads
+    """
+    
+    async def get_token(self):
+        """
+        Token partagé ; l'appel OAuth éventuel part dans un thread
+        """
+        self.token = self.tokens.cached_token() or await asyncio.to_thread(self.tokens.get_token)
+        return self.token is not None
+    
+    async def search_flights(self, *args, **kwargs):
+        """
+        Recherche vols réels (3 meilleures offres selon sort_by, sous max_price)
+        """
+        return await self._search_flights(*args, **kwargs)
+    
+    async def search_flights_multi(self, *args, **kwargs):
+        """
+        Comme search_flights, sur tous les aéroports des deux villes (CDG, ORY, BVA...)
+        """
+        return await self._search_flights_multi(*args, **kwargs)
+    
+    async def search_multi_offers(self, *args, **kwargs):
+        """
+        Offres de toutes les paires d'aéroports, en parallèle (durée ~ la requête la plus lente)
+        """
+        return await self._search_multi_offers(*args, **kwargs)
+    
+    async def search_offers(self, *args, **kwargs):
+        """
+        Offres Amadeus (tuple de FlightOffer), servies depuis le cache si possible
+        """
+        return await self._search_offers(*args, **kwargs)
+    
+    async def search_flexible(self, *args, **kwargs):
+        """
+        Calendrier des prix ± window jours (requêtes en parallèle, bornées)
+        """
+        return await self._search_flexible(*args, **kwargs)
+    
+    async def _token_ready(self):
+        return await self.get_token()
+    
+    async def _refresh_token(self):
+        return await asyncio.to_thread(self.tokens.refresh, self.token)
+    
+    async def _send(self, method, url, **kwargs):
+        return await http_transport.request_async(method, url, **kwargs)
+    
+    async def _single_flight(self, key, fn, *args):
+        return await flight_requests.do_async(key, fn, *args)
+    
+    async def _gather(self, calls, max_workers):
+        semaphore = asyncio.Semaphore(max_workers)
         
-        for i, offer in enumerate(data["data"][:3], 1):
-            price = offer["price"]["total"]
-            
-            # Premier segment (aller)
-            outbound = offer["itineraries"][0]
-            segments = outbound["segments"]
-            
-            departure = segments[0]["departure"]
-            arrival = segments[-1]["arrival"]
-            
-            dep_time = departure["at"].split("T")[1][:5]
-            arr_time = arrival["at"].split("T")[1][:5]
-            
-            duration = outbound["duration"].replace("PT", "").replace("H", "h").replace("M", "min")
-            
-            stops = len(segments) - 1
-            airlines = segments[0]["carrierCode"]
-            
-            flights_text += f"{i}. {airlines} - {price}€\n"
-            flights_text += f"   {departure['iataCode']} {dep_time} → {arrival['iataCode']} {arr_time}\n"
-            flights_text += f"   Durée: {duration} | Escales: {stops}\n\n"
+        async def run(call):
+            async with semaphore:
+                return await call()
         
-        return flights_text
+        return await asyncio.gather(*(run(call) for call in calls))
+
 
 # Test
 # Test
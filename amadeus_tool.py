@@ -1,32 +1,51 @@
-from amadeus_api import AmadeusAPI
+import os
+import airport_index
+from amadeus_api import AmadeusAPI, format_price_calendar
+
+# Aéroports max interrogés par ville (Londres en a 6)
+MULTI_AIRPORT_MAX = int(os.getenv("MULTI_AIRPORT_MAX", "3"))
 
 def search_flights_tool(query: str) -> str:
     """
     Recherche vols réels via Amadeus API.
     
-    Query format: "origin destination departure_date return_date"
-    Exemple: "CMN CDG 2026-01-28 2026-01-30"
+    Query format: "origin destination departure_date [return_date] [budget]"
+    Exemple: "CMN CDG 2026-01-28 2026-01-30 500"
+    Tous les aéroports de la ville sont comparés (CDG -> CDG, ORY, BVA).
     """
     try:
         parts = query.split()
         
         if len(parts) < 3:
-            return "❌ Format invalide. Utilise: origin destination departure_date [return_date]"
+            return "❌ Format invalide. Utilise: origin destination departure_date [return_date] [budget]"
+        
+        # Budget max (€) : les offres au-dessus sont écartées avant le LLM
+        max_price = None
+        if parts[-1].replace(".", "", 1).isdigit():
+            max_price = float(parts.pop())
         
         origin = parts[0]
         destination = parts[1]
         departure_date = parts[2]
         return_date = parts[3] if len(parts) > 3 else None
         
+        origins = expand_airports(origin)
+        destinations = expand_airports(destination)
+        # Ville introuvable : pas de code inventé envoyé à Amadeus
+        for place, codes in ((origin, origins), (destination, destinations)):
+            if not codes:
+                return f"❌ Aéroport inconnu : {place}. Utilise un code IATA (ex : CDG) ou le nom de la ville"
+        
         api = AmadeusAPI()
         
-        result = api.search_flights(
-            origin=origin,
-            destination=destination,
+        result = api.search_flights_multi(
+            origins=origins,
+            destinations=destinations,
             departure_date=departure_date,
             return_date=return_date,
             adults=1,
-            max_results=5
+            max_results=5,
+            max_price=max_price
         )
         
         return result if result else "❌ Aucun vol trouvé"
@@ -34,6 +53,38 @@ def search_flights_tool(query: str) -> str:
     except Exception as e:
         return f"❌ Erreur : {e}"
 
+def search_flexible_tool(query: str) -> str:
+    """
+    Calendrier des prix sur dates flexibles via Amadeus API.
+    
+    Query format: "origin destination departure_date [return_date] [window]"
+    Exemple: "CMN CDG 2026-01-28 2026-01-30 3"  (± 3 jours)
+    """
+    try:
+        parts = query.split()
+        
+        if len(parts) < 3:
+            return "❌ Format invalide. Utilise: origin destination departure_date [return_date] [window]"
+        
+        window = 3
+        if parts[-1].isdigit():
+            window = int(parts.pop())
+        
+        return_date = parts[3] if len(parts) > 3 else None
+        
+        calendar = AmadeusAPI().search_flexible(
+            origin=parts[0],
+            destination=parts[1],
+            center_date=parts[2],
+            return_date=return_date,
+            window=window
+        )
+        
+        return format_price_calendar(calendar) if calendar else "❌ Aucun vol trouvé"
+    
+    except Exception as e:
+        return f"❌ Erreur : {e}"
+
 # Codes aéroports courants
 AIRPORT_CODES = {
     "casablanca": "CMN",
@@ -49,7 +100,26 @@ AIRPORT_CODES = {
     "dubai": "DXB"
 }
 
-def get_airport_code(city: str) -> str:
-    """Convertit nom ville en code aéroport"""
-    city_lower = city.lower().strip()
-    return AIRPORT_CODES.get(city_lower, city.upper()[:3])
\ No newline at end of file
+def get_airport_codes(city: str) -> tuple:
+    """Tous les aéroports d'une ville, principal en premier (Paris -> CDG, ORY, BVA)"""
+    codes = airport_index.get_airport_codes(city)
+    primary = AIRPORT_CODES.get(city.lower().strip())
+    if primary and codes and codes[0] != primary:
+        codes = (primary,) + tuple(c for c in codes if c != primary)
+    return codes or ((primary,) if primary else ())
+
+def find_airport_code(city: str):
+    """Code aéroport principal pour une ville ou un code IATA, sinon None"""
+    codes = get_airport_codes(city)
+    return codes[0] if codes else None
+
+def expand_airports(place: str) -> tuple:
+    """
+    Ville ou code -> aéroports de la même ville (CDG -> CDG, ORY, BVA), le demandé en premier.
+    Tuple vide si le lieu est inconnu.
+    """
+    codes = get_airport_codes(place)
+    airport = airport_index.get_airport(place.strip()) if len(place.strip()) == 3 else None
+    if airport:
+        codes = (place.strip().upper(),) + tuple(c for c in get_airport_codes(airport[0]) if c != place.strip().upper())
+    return codes[:MULTI_AIRPORT_MAX]
@@ -0,0 +1,111 @@
+"""
+Calendrier des prix ±3 jours aller-retour (49 requêtes Amadeus) face au quota
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_calendar
+    python -m benchmarks.bench_calendar --amadeus-latency 300 --quota 10
+
+1. Sans quota : vol seul + calendrier doivent durer environ une requête
+   (calendrier en une vague, en parallèle de la recherche principale).
+2. Avec quota (429 au-delà de --quota requêtes simultanées) : la rafale du
+   calendrier ne doit pas ouvrir le disjoncteur Amadeus des autres utilisateurs.
+
+Code de sortie 1 si l'une des deux vérifications échoue.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from benchmarks.standins import AmadeusStandIn
+
+STATE = {
+    'depart': "Casablanca",
+    'destination': "Paris",
+    'type_vol': "aller-retour",
+    'avec_hotel': False,
+    'budget': "500",
+    'flex': 3
+}
+
+
+def voyage(annee):
+    # Dates neuves à chaque phase : rien ne vient du cache vols
+    return dict(STATE, date_depart=f"10/03/{annee}", date_retour=f"15/03/{annee}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--amadeus-latency", default="200", help="ms, ou lognormal:200:0.3")
+    parser.add_argument("--quota", type=int, default=10, help="requêtes Amadeus simultanées avant 429")
+    parser.add_argument("--users", type=int, default=5, help="recherches d'autres utilisateurs après la rafale")
+    parser.add_argument("--max-waves", type=float, default=2.5, help="échec si vol + calendrier dépasse N requêtes")
+    args = parser.parse_args()
+
+    amadeus = AmadeusStandIn(args.amadeus_latency).start()
+    os.environ.update({
+        "AMADEUS_BASE_URL": amadeus.url,
+        "AMADEUS_API_KEY": "standin",
+        "AMADEUS_API_SECRET": "standin",
+        "FLIGHT_CACHE_FILE": ""
+    })
+
+    import resilience
+    from amadeus_api import CALENDAR_UPSTREAM, AmadeusAPI
+    from fast_path import search_flights_fast
+
+    api = AmadeusAPI()
+    api.get_token()
+
+    start = time.perf_counter()
+    api.search_offers("CMN", "MAD", "2030-01-10")
+    une_requete = time.perf_counter() - start
+
+    # Phase 1 : pas de quota
+    start = time.perf_counter()
+    resultat = search_flights_fast(voyage(2031))
+    duree = time.perf_counter() - start
+    calendrier_ok = resultat is not None and "CALENDRIER" in resultat
+
+    # Phase 2 : quota, puis d'autres utilisateurs (les 429 attendus ne sont pas affichés)
+    amadeus.max_concurrent = args.quota
+    avant = amadeus.throttled
+    with contextlib.redirect_stdout(io.StringIO()):
+        search_flights_fast(voyage(2032))
+    refus = amadeus.throttled - avant
+    etat = resilience.breaker("amadeus").state
+    etat_calendrier = resilience.breaker(CALENDAR_UPSTREAM).state
+
+    amadeus.max_concurrent = None
+    servis = sum(
+        api.search_offers("CMN", "LHR", f"2033-02-{jour:02d}") is not None
+        for jour in range(1, args.users + 1)
+    )
+
+    print("=" * 60)
+    print(f"{'Une requête Amadeus':<28} {une_requete * 1000:.0f} ms")
+    print(f"{'Vol + calendrier ±3':<28} {duree * 1000:.0f} ms ({duree / une_requete:.1f} requêtes)")
+    print(f"{'Rafale sous quota':<28} {refus} réponses 429 (quota {args.quota})")
+    print(f"{'Disjoncteurs':<28} amadeus {etat}, calendrier {etat_calendrier}")
+    print(f"{'Autres utilisateurs':<28} {servis}/{args.users} servis")
+    print("=" * 60)
+
+    echecs = []
+    if not calendrier_ok:
+        echecs.append("calendrier absent du résultat")
+    if duree > args.max_waves * une_requete:
+        echecs.append(f"vol + calendrier {duree / une_requete:.1f} requêtes > {args.max_waves}")
+    if etat != "closed" or servis < args.users:
+        echecs.append("la rafale du calendrier a bloqué les recherches des autres utilisateurs")
+
+    for echec in echecs:
+        print(f"❌ {echec}")
+    if echecs:
+        sys.exit(1)
+    print("✅ Calendrier en une vague, disjoncteur Amadeus intact")
+
+
+if __name__ == "__main__":
+    main()
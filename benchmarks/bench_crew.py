@@ -0,0 +1,63 @@
+"""
+Temps d'exécution de la Crew : mode hiérarchique (manager LLM) vs parallèle
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_crew --runs 3
+    python -m benchmarks.bench_crew --runs 1 --sans-hotel
+"""
+import argparse
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+TRIP = {
+    'depart': "Casablanca",
+    'destination': "Paris",
+    'type_vol': "aller-retour",
+    'date_depart': "28/01",
+    'date_retour': "30/01",
+    'avec_hotel': True,
+    'budget': "500"
+}
+
+
+def mesurer(mode, state, runs):
+    from whatsapp_travel_bot import lancer_crew
+
+    durees = []
+    for i in range(runs):
+        start = time.perf_counter()
+        lancer_crew(dict(state), mode=mode)
+        durees.append(time.perf_counter() - start)
+        print(f"   {mode} #{i + 1} : {durees[-1]:.1f}s")
+
+    return durees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--sans-hotel", action="store_true", help="vol seul (pas de tâche hôtel)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    state = dict(TRIP, avec_hotel=not args.sans_hotel)
+
+    resultats = {}
+    for mode in ("hierarchical", "parallel"):
+        print(f"\n🚀 Mode {mode}...")
+        resultats[mode] = mesurer(mode, state, args.runs)
+
+    print("\n" + "=" * 50)
+    print(f"{'mode':<14} {'moyenne':>9} {'min':>8} {'max':>8}")
+    for mode, durees in resultats.items():
+        print(f"{mode:<14} {statistics.mean(durees):>8.1f}s {min(durees):>7.1f}s {max(durees):>7.1f}s")
+
+    avant = statistics.mean(resultats["hierarchical"])
+    apres = statistics.mean(resultats["parallel"])
+    print(f"\n⏱️ Gain : {avant - apres:.1f}s ({(avant - apres) / avant:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Charge de bout en bout sur /whatsapp : N utilisateurs simulés, services externes locaux
+
+Toute la conversation (intro -> destination -> ... -> confirmation) est jouée
+contre le vrai webhook ; Twilio, Amadeus, Unsplash et l'API Anthropic sont
+remplacés par des serveurs locaux (benchmarks/standins.py).
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_load --users 50 --concurrency 20
+    python -m benchmarks.bench_load --users 20 --hotel-ratio 1 --llm-latency lognormal:800:0.4
+    python -m benchmarks.bench_load --max-p95-ms 50 --max-ttfr-s 5    # code retour 1 si dépassé
+    python -m benchmarks.bench_load --hotel-ratio 1 --max-package-s 30
+    python -m benchmarks.bench_load --users 200 --concurrency 50 --shards 4   # routeur + 4 workers
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.standins import AmadeusStandIn, AnthropicStandIn, TwilioStandIn, UnsplashStandIn
+
+DESTINATIONS = ["Paris", "Londres", "Rome", "Madrid", "Barcelone", "Lisbonne", "Istanbul", "Dubai"]
+DEPARTS = ["Casablanca", "Marrakech", "Fès", "Tanger", "Rabat", "Agadir"]
+
+# Premier résultat : aperçu vols envoyé pendant la Crew, ou directement le package
+FIRST_RESULT_MARKERS = ("VOLS TROUVÉS", "PACKAGE TROUVÉ")
+PACKAGE_MARKER = "PACKAGE TROUVÉ"
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def rss_mb(pid="self"):
+    """
+    Mémoire résidente d'un processus (Linux), 0 si indisponible
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class Sampler:
+    """
+    Relève threads et mémoire pendant la charge (mémoire des workers comprise)
+    """
+
+    def __init__(self, interval=0.05, pids=lambda: []):
+        self.interval = interval
+        self.pids = pids
+        self.max_threads = threading.active_count()
+        self.max_rss = self.rss()
+        self._stop = threading.Event()
+
+    def rss(self):
+        return rss_mb() + sum(rss_mb(pid) for pid in self.pids())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.max_threads = max(self.max_threads, threading.active_count())
+            self.max_rss = max(self.max_rss, self.rss())
+
+    def __enter__(self):
+        threading.Thread(target=self._run, name="sampler", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+
+def conversation(hotel, rng):
+    """
+    Messages d'un utilisateur, de l'intro à la confirmation
+    """
+    depart = date.today() + timedelta(days=rng.randint(20, 90))
+    aller_retour = rng.random() < 0.7
+
+    messages = ["Bonjour", "GO", rng.choice(DESTINATIONS), rng.choice(DEPARTS)]
+    if aller_retour:
+        retour = depart + timedelta(days=rng.randint(2, 10))
+        messages += ["1", f"{depart:%d/%m} - {retour:%d/%m}"]
+    else:
+        messages += ["2", f"{depart:%d/%m}"]
+    messages += ["OUI" if hotel else "NON", str(rng.choice([300, 500, 800])), "OUI"]
+
+    return messages
+
+
+def post(url, from_number, body):
+    data = urllib.parse.urlencode({"From": from_number, "Body": body}).encode()
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, data=data, timeout=30) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def simuler(i, webhook_url, twilio, args):
+    """
+    Joue une conversation ; renvoie (latences webhook, temps jusqu'au premier
+    résultat, temps jusqu'au package), None si absent
+    """
+    rng = random.Random(args.seed + i)
+    from_number = f"whatsapp:+2126{i:08d}"
+    latences = []
+
+    for body in conversation(rng.random() < args.hotel_ratio, rng):
+        if args.think:
+            time.sleep(rng.uniform(0, args.think / 1000))
+        sent_at = time.perf_counter()
+        latences.append(post(webhook_url, from_number, body))
+
+    package_at = twilio.wait_for(from_number, PACKAGE_MARKER, sent_at, args.timeout)
+    premier_at = twilio.wait_for(from_number, FIRST_RESULT_MARKERS, sent_at, 0)
+    return (
+        latences,
+        (premier_at - sent_at) if premier_at else None,
+        (package_at - sent_at) if package_at else None
+    )
+
+
+def configurer(standins, workdir):
+    """
+    Le bot parle aux serveurs locaux ; sessions dans un dossier jetable,
+    cache photos en mémoire seulement (sa sauvegarde à la sortie passerait
+    après la suppression du dossier)
+    """
+    amadeus, unsplash, twilio, anthropic = standins
+    os.environ.update({
+        "AMADEUS_BASE_URL": amadeus.url,
+        "UNSPLASH_BASE_URL": unsplash.url,
+        "TWILIO_API_BASE": twilio.url,
+        "ANTHROPIC_BASE_URL": anthropic.url,
+        "SESSION_DB": os.path.join(workdir, "sessions.db"),
+        "PHOTO_CACHE_FILE": ""
+    })
+    for name, value in {
+        "AMADEUS_API_KEY": "standin", "AMADEUS_API_SECRET": "standin",
+        "UNSPLASH_ACCESS_KEY": "standin", "ANTHROPIC_API_KEY": "standin",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32, "TWILIO_AUTH_TOKEN": "standin",
+        "TWILIO_WHATSAPP_NUMBER": "whatsapp:+14155238886"
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+def demarrer_bot():
+    """
+    Vrai webhook Flask (create_app) servi en local, multi-thread
+    """
+    from werkzeug.serving import make_server
+
+    import whatsapp_travel_bot as bot
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, bot.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="webhook", daemon=True).start()
+
+    return bot, server, f"http://127.0.0.1:{server.server_port}/whatsapp"
+
+
+def ports_libres(n):
+    sockets = [socket.socket() for _ in range(n)]
+    for s in sockets:
+        s.bind(("127.0.0.1", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def demarrer_shards(n, verbose):
+    """
+    n processus create_app() derrière le routeur de shard_router.py
+    """
+    from werkzeug.serving import make_server
+
+    import shard_router
+    from sharding import HashRing
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    os.environ.setdefault("SHARD_SECRET", "bench")
+    workers = shard_router.LocalWorkers(ports_libres(n), quiet=not verbose).start()
+
+    router = shard_router.create_router(shard_router.ShardRouter(HashRing(workers.nodes)))
+    server = make_server("127.0.0.1", 0, router, threaded=True)
+    threading.Thread(target=server.serve_forever, name="router", daemon=True).start()
+
+    return workers, server, f"http://127.0.0.1:{server.server_port}/whatsapp"
+
+
+def afficher(titre, valeurs, unite=1000, suffixe="ms"):
+    print(
+        f"{titre:<22} p50 {percentile(valeurs, 50) * unite:>8.1f}{suffixe}"
+        f"  p95 {percentile(valeurs, 95) * unite:>8.1f}{suffixe}"
+        f"  p99 {percentile(valeurs, 99) * unite:>8.1f}{suffixe}"
+        f"  max {max(valeurs, default=float('nan')) * unite:>8.1f}{suffixe}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20, help="conversations simulées")
+    parser.add_argument("--concurrency", type=int, default=10, help="conversations simultanées")
+    parser.add_argument("--hotel-ratio", type=float, default=0.3, help="part des demandes avec hôtel (Crew)")
+    parser.add_argument("--think", type=float, default=0, help="pause max entre deux messages (ms)")
+    parser.add_argument("--timeout", type=float, default=120, help="attente max du résultat (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--twilio-latency", default="uniform:30:120")
+    parser.add_argument("--amadeus-latency", default="lognormal:400:0.4")
+    parser.add_argument("--unsplash-latency", default="uniform:80:250")
+    parser.add_argument("--llm-latency", default="lognormal:1500:0.5")
+    parser.add_argument("--max-p95-ms", type=float, help="échec si p95 webhook au-dessus")
+    parser.add_argument("--max-ttfr-s", type=float, help="échec si p95 temps-jusqu'au-premier-résultat au-dessus")
+    parser.add_argument("--max-package-s", type=float, help="échec si p95 temps-jusqu'au-package au-dessus")
+    parser.add_argument("--shards", type=int, default=0, help="workers multi-processus derrière le routeur (0 : un seul processus)")
+    parser.add_argument("--verbose", action="store_true", help="garder les logs du bot")
+    args = parser.parse_args()
+
+    standins = (
+        AmadeusStandIn(args.amadeus_latency).start(),
+        UnsplashStandIn(args.unsplash_latency).start(),
+        TwilioStandIn(args.twilio_latency).start(),
+        AnthropicStandIn(args.llm_latency).start()
+    )
+    twilio = standins[2]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configurer(standins, workdir)
+        if args.shards:
+            workers, server, webhook_url = demarrer_shards(args.shards, args.verbose)
+            pids = workers.pids
+        else:
+            bot, server, webhook_url = demarrer_bot()
+            pids = lambda: []
+
+        threads_avant = threading.active_count()
+        print(f"🚀 {args.users} utilisateurs, {args.concurrency} simultanés -> {webhook_url}")
+
+        logs = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with Sampler(pids=pids) as sampler, logs:
+            rss_avant = sampler.max_rss
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                resultats = list(pool.map(
+                    lambda i: simuler(i, webhook_url, twilio, args), range(args.users)
+                ))
+            if not args.shards:
+                bot.outbound.flush(timeout=args.timeout)
+        duree = time.perf_counter() - start
+
+        server.shutdown()
+        if args.shards:
+            workers.stop()
+        else:
+            jobs = bot.search_jobs.stats()
+
+    for standin in standins:
+        standin.stop()
+
+    latences = [l for lat, _, _ in resultats for l in lat]
+    ttfr = [t for _, t, _ in resultats if t is not None]
+    packages = [t for _, _, t in resultats if t is not None]
+    perdus = sum(1 for _, _, t in resultats if t is None)
+
+    print("\n" + "=" * 70)
+    afficher("Webhook /whatsapp", latences)
+    afficher("1er résultat", ttfr, unite=1, suffixe="s ")
+    afficher("Package complet", packages, unite=1, suffixe="s ")
+    print(f"{'Recherches':<22} {len(packages)} abouties, {perdus} sans résultat, {len(packages) / duree:.2f} jobs/s")
+    if args.shards:
+        print(f"{'Processus':<22} routeur + {args.shards} workers (threads et jobs : voir /status des workers)")
+    else:
+        print(
+            f"{'Jobs':<22} {jobs['states']['done']} terminés, {jobs['states']['failed']} échoués, "
+            f"{jobs['rejected']} refusés"
+        )
+    print(
+        f"{'Threads':<22} {threads_avant} au départ, pic {sampler.max_threads} "
+        f"(+{sampler.max_threads - threads_avant}), {threading.active_count()} à la fin"
+    )
+    print(f"{'Mémoire':<22} {rss_avant:.0f} Mo au départ, pic {sampler.max_rss:.0f} Mo (+{sampler.max_rss - rss_avant:.0f})")
+    print(f"{'Appels externes':<22} " + ", ".join(f"{s.name} {s.requests}" for s in standins))
+    print(f"{'Durée':<22} {duree:.1f}s")
+
+    echecs = []
+    if args.max_p95_ms is not None and percentile(latences, 95) * 1000 > args.max_p95_ms:
+        echecs.append(f"p95 webhook > {args.max_p95_ms} ms")
+    if args.max_ttfr_s is not None and (perdus or percentile(ttfr, 95) > args.max_ttfr_s):
+        echecs.append(f"p95 temps-jusqu'au-premier-résultat > {args.max_ttfr_s} s")
+    if args.max_package_s is not None and (perdus or percentile(packages, 95) > args.max_package_s):
+        echecs.append(f"p95 temps-jusqu'au-package > {args.max_package_s} s")
+    if echecs:
+        print("\n❌ " + ", ".join(echecs))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
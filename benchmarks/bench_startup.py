@@ -0,0 +1,90 @@
+"""
+Démarrage à froid du bot : import du module + create_app(), dans un processus neuf
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --compare HEAD~1
+    python -m benchmarks.bench_startup --module main --compare HEAD~1
+"""
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Les anciennes versions n'ont pas de create_app() : l'import suffit alors
+SCRIPT = """
+import importlib, time
+start = time.perf_counter()
+bot = importlib.import_module({module!r})
+if hasattr(bot, "create_app"):
+    bot.create_app()
+print("⏱️", time.perf_counter() - start)
+"""
+
+
+def mesurer(repertoire, runs, module="whatsapp_travel_bot"):
+    durees = []
+    for i in range(runs):
+        sortie = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(module=module)],
+            cwd=repertoire, capture_output=True, text=True, check=True
+        )
+        # Le module mesuré peut lui-même écrire sur stdout (démo Crew)
+        mesure = [l for l in sortie.stdout.splitlines() if l.startswith("⏱️ ")][-1]
+        durees.append(float(mesure.split()[1]))
+        print(f"   #{i + 1} : {durees[-1] * 1000:.0f} ms")
+
+    return durees
+
+
+def extraire(revision, destination):
+    """
+    Copie de l'arbre à une révision git (git archive)
+    """
+    archive = subprocess.run(
+        ["git", "archive", revision], cwd=RACINE, capture_output=True, check=True
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(destination)
+
+
+def afficher(nom, durees):
+    print(f"{nom:<14} {statistics.mean(durees) * 1000:>8.0f} ms {min(durees) * 1000:>7.0f} ms {max(durees) * 1000:>7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare", metavar="REV", help="révision git de référence")
+    parser.add_argument("--module", default="whatsapp_travel_bot", help="module importé (main : démo Crew)")
+    args = parser.parse_args()
+
+    resultats = {}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            extraire(args.compare, tmp)
+            print(f"\n🚀 {args.compare}...")
+            resultats[args.compare] = mesurer(tmp, args.runs, args.module)
+
+    print("\n🚀 Arbre courant...")
+    resultats["courant"] = mesurer(RACINE, args.runs, args.module)
+
+    print("\n" + "=" * 50)
+    print(f"{'version':<14} {'moyenne':>11} {'min':>10} {'max':>10}")
+    for nom, durees in resultats.items():
+        afficher(nom, durees)
+
+    if args.compare:
+        avant = statistics.mean(resultats[args.compare])
+        apres = statistics.mean(resultats["courant"])
+        print(f"\n⏱️ Gain : {(avant - apres) * 1000:.0f} ms ({(avant - apres) / avant:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Serveurs locaux qui imitent Twilio, Amadeus, Unsplash et l'API Anthropic
+
+Chaque serveur répond avec une latence tirée d'une distribution :
+    "0"                 aucune
+    "80"                constante (ms)
+    "uniform:20:120"    uniforme entre 20 et 120 ms
+    "lognormal:150:0.5" log-normale de médiane 150 ms, sigma 0.5
+    "exp:100"           exponentielle de moyenne 100 ms
+"""
+import json
+import math
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def latency(spec):
+    """
+    Spécification -> fonction qui renvoie un délai en secondes
+    """
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        value = float(kind) / 1000
+        return lambda: value
+
+    params = [float(a) for a in args.split(":")]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda: random.lognormvariate(mu, params[1]) / 1000
+    if kind == "exp":
+        return lambda: random.expovariate(1 / params[0]) / 1000
+
+    raise ValueError(f"Distribution inconnue : {spec}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status, payload):
+        time.sleep(self.server.delay())
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    # Rafales de connexions (calendrier des prix) : pas de SYN perdu
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Client parti avant la réponse (hedging, deadline) : attendu
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class StandIn:
+    """
+    Un serveur HTTP local dans un thread démon
+    """
+
+    name = "standin"
+    handler = _Handler
+
+    def __init__(self, delay="0"):
+        self.server = _Server(("127.0.0.1", 0), self.handler)
+        self.server.daemon_threads = True
+        self.server.delay = latency(delay)
+        self.server.standin = self
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name=self.name, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# ========================================
+# AMADEUS
+# ========================================
+
+def _segment(origin, destination, departure):
+    return {
+        "departure": {"iataCode": origin, "at": departure.isoformat(timespec="seconds")},
+        "arrival": {"iataCode": destination, "at": (departure + timedelta(hours=3)).isoformat(timespec="seconds")},
+        "carrierCode": random.choice(["AT", "AF", "IB", "FR", "U2"]),
+        "number": str(random.randint(100, 9999))
+    }
+
+
+def fake_offers(origin, destination, departure_date, return_date=None, count=5):
+    data = []
+    for i in range(count):
+        departure = datetime.fromisoformat(departure_date) + timedelta(hours=6 + 2 * i)
+        itineraries = [{"duration": "PT3H", "segments": [_segment(origin, destination, departure)]}]
+        if return_date:
+            back = datetime.fromisoformat(return_date) + timedelta(hours=8 + 2 * i)
+            itineraries.append({"duration": "PT3H", "segments": [_segment(destination, origin, back)]})
+
+        data.append({
+            "id": str(i + 1),
+            "price": {"total": f"{random.uniform(80, 600):.2f}", "currency": "EUR"},
+            "itineraries": itineraries
+        })
+
+    return {"data": data}
+
+
+class _AmadeusHandler(_Handler):
+
+    def do_POST(self):
+        self._body()
+        self.server.standin.count()
+        self._reply(200, {"access_token": "standin-token", "expires_in": 1799})
+
+    def do_GET(self):
+        standin = self.server.standin
+        standin.count()
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+
+        # Quota dépassé : 429 comme l'environnement de test Amadeus
+        if not standin.admit():
+            return self._reply(429, {"errors": [{"status": 429, "title": "Too many requests"}]})
+        try:
+            self._offers(query)
+        finally:
+            standin.release()
+
+    def _offers(self, query):
+        self._reply(200, fake_offers(
+            query.get("originLocationCode", "CMN"),
+            query.get("destinationLocationCode", "CDG"),
+            query.get("departureDate", "2030-01-28"),
+            query.get("returnDate")
+        ))
+
+
+class AmadeusStandIn(StandIn):
+    """
+    max_concurrent : au-delà, les recherches reçoivent 429 (None = illimité)
+    """
+
+    name = "amadeus"
+    handler = _AmadeusHandler
+
+    def __init__(self, delay="0", max_concurrent=None):
+        super().__init__(delay)
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.throttled = 0
+
+    def admit(self):
+        with self._lock:
+            if self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+                self.throttled += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+# ========================================
+# UNSPLASH
+# ========================================
+
+class _UnsplashHandler(_Handler):
+
+    def do_GET(self):
+        self.server.standin.count()
+        query = parse_qs(urlparse(self.path).query)
+        per_page = int(query.get("per_page", ["3"])[0])
+        self._reply(200, {"results": [
+            {
+                "urls": {
+                    "regular": f"https://images.example/{i}.jpg",
+                    "thumb": f"https://images.example/{i}-thumb.jpg"
+                },
+                "alt_description": query.get("query", [""])[0],
+                "user": {"name": "Stand-in"}
+            }
+            for i in range(per_page)
+        ]})
+
+
+class UnsplashStandIn(StandIn):
+    name = "unsplash"
+    handler = _UnsplashHandler
+
+# ========================================
+# TWILIO
+# ========================================
+
+class _TwilioHandler(_Handler):
+
+    def do_POST(self):
+        form = parse_qs(self._body().decode())
+        standin = self.server.standin
+        standin.count()
+        standin.record(form.get("To", [""])[0], form.get("Body", [""])[0], form.get("MediaUrl", []))
+
+        self._reply(201, {
+            "sid": f"SM{random.getrandbits(64):016x}",
+            "status": "queued",
+            "to": form.get("To", [""])[0],
+            "body": form.get("Body", [""])[0]
+        })
+
+
+class TwilioStandIn(StandIn):
+    """
+    Garde les messages reçus par destinataire (horodatés) pour le benchmark
+    """
+
+    name = "twilio"
+    handler = _TwilioHandler
+
+    def __init__(self, delay="0"):
+        super().__init__(delay)
+        self.messages = {}
+        self._cond = threading.Condition()
+
+    def record(self, to, body, media):
+        with self._cond:
+            self.messages.setdefault(to, []).append((time.perf_counter(), body, media))
+            self._cond.notify_all()
+
+    def wait_for(self, to, marker, since, timeout):
+        """
+        Horodatage du premier message à `to` contenant `marker` (ou l'un des
+        marqueurs d'un tuple) après `since`, ou None
+        """
+        markers = (marker,) if isinstance(marker, str) else tuple(marker)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for at, body, _ in self.messages.get(to, ()):
+                    if at >= since and any(m in body for m in markers):
+                        return at
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+# ========================================
+# ANTHROPIC (LLM des agents)
+# ========================================
+
+class _AnthropicHandler(_Handler):
+
+    def do_POST(self):
+        self._body()
+        self.server.standin.count()
+        self._reply(200, {
+            "id": f"msg_{random.getrandbits(64):016x}",
+            "type": "message",
+            "role": "assistant",
+            "model": "claude-sonnet-4-20250514",
+            "content": [{
+                "type": "text",
+                "text": (
+                    "Thought: I now can give a great answer\n"
+                    "Final Answer: Vol AT 123 à 230€, hôtel centre-ville 3* à 90€/nuit, total 410€."
+                )
+            }],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 200, "output_tokens": 40}
+        })
+
+
+class AnthropicStandIn(StandIn):
+    name = "anthropic"
+    handler = _AnthropicHandler
@@ -0,0 +1,245 @@
+import atexit
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from lazy import ProcessThreads
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# Cache persisté : écrit sur disque au plus toutes les N secondes (et à la sortie)
+CACHE_SAVE_INTERVAL = float(os.getenv("CACHE_SAVE_INTERVAL", "30"))
+
+
+class TTLCache:
+    """
+    Cache LRU borné avec expiration (TTL) et persistance disque optionnelle.
+    stale_ttl : une entrée expirée reste lisible par get_stale() pendant ce
+    délai (service dégradé : mieux vaut une valeur ancienne que rien).
+    path : sauvegarde en arrière-plan toutes les save_interval secondes,
+    fusionnée avec le fichier (plusieurs processus peuvent le partager).
+    """
+
+    def __init__(self, maxsize=256, ttl=600, path=None, stale_ttl=0, save_interval=CACHE_SAVE_INTERVAL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.stale_ttl = stale_ttl
+        self.save_interval = save_interval
+
+        # clé -> (expire_at, valeur), ordre = du moins au plus récemment utilisé
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        # Modifié depuis la dernière sauvegarde ; clés supprimées à ne pas reprendre du fichier
+        self._dirty = False
+        self._deleted = set()
+        self._saver = ProcessThreads(self._save_loop, name="cache-save")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+        if path:
+            self._load()
+            atexit.register(self._save_if_dirty)
+
+    def get(self, key, default=None):
+        """
+        Valeur en cache, ou default si absente / expirée
+        """
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                if expires_at + self.stale_ttl < time.time():
+                    del self._data[key]
+                    self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key, default=None):
+        """
+        Valeur même expirée (dans la limite de stale_ttl), ou default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] + self.stale_ttl < time.time():
+                return default
+
+            self.stale_hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """
+        Ajoute une valeur (évince la moins récemment utilisée si plein)
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+            self._deleted.discard(key)
+            self._dirty = True
+
+        if self.path:
+            self._saver.ensure_started()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._deleted.add(key)
+            self._dirty = True
+
+        if self.path:
+            self._saver.ensure_started()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._deleted.clear()
+            self._dirty = False
+
+        if self.path:
+            self.save(merge=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] >= time.time()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+        Compteurs hit/miss/éviction
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+    # ========================================
+    # PERSISTANCE
+    # ========================================
+
+    def save(self, merge=True):
+        """
+        Écrit le cache sur disque (écriture atomique). merge=True : les
+        entrées écrites entre-temps par d'autres processus sont gardées.
+        """
+        with self._lock:
+            snapshot = list(self._data.items())
+            deleted = set(self._deleted)
+            self._deleted.clear()
+            self._dirty = False
+
+        # Un fichier temporaire par processus : plusieurs workers partagent le cache
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        # Dossier disparu ou en lecture seule (verrou compris) : on le signale
+        # sans arrêter le thread de sauvegarde
+        try:
+            with self._save_lock, self._file_lock():
+                if merge:
+                    snapshot = self._merge(self._read(), snapshot, deleted)
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"❌ Erreur sauvegarde cache {self.path} : {e}")
+            # Rien n'est écrit : la prochaine sauvegarde reprend ces changements
+            with self._lock:
+                self._deleted |= deleted - self._data.keys()
+                self._dirty = True
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _merge(self, on_disk, snapshot, deleted):
+        """
+        Fichier + mémoire : pour une même clé l'entrée la plus récente gagne,
+        les entrées de ce processus restent les plus récemment utilisées
+        """
+        ours = dict(snapshot)
+        now = time.time()
+        merged = [
+            (key, entry) for key, entry in on_disk
+            if key not in deleted
+            and entry[0] + self.stale_ttl >= now
+            and (key not in ours or entry[0] > ours[key][0])
+        ]
+        newer = {key for key, _ in merged}
+        merged += [(key, entry) for key, entry in snapshot if key not in newer]
+        return merged[-self.maxsize:]
+
+    def _save_if_dirty(self):
+        if self._dirty:
+            self.save()
+
+    def _save_loop(self):
+        while True:
+            time.sleep(self.save_interval)
+            self._save_if_dirty()
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Verrou exclusif entre processus pendant lecture-fusion-écriture
+        """
+        if fcntl is None:
+            yield
+            return
+
+        with open(f"{self.path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+
+        try:
+            with open(self.path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"❌ Erreur lecture cache {self.path} : {e}")
+            return []
+
+    def _load(self):
+        now = time.time()
+        for key, (expires_at, value) in self._read()[-self.maxsize:]:
+            if expires_at + self.stale_ttl >= now:
+                self._data[key] = (expires_at, value)
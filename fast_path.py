@@ -0,0 +1,154 @@
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from amadeus_api import AmadeusAPI, format_price_calendar
+from amadeus_tool import expand_airports, find_airport_code
+from flight_offers import format_flights, rank_offers
+
+# Recherches "juste le vol" sans Crew (FLIGHT_FAST_PATH=0 pour désactiver)
+FAST_PATH_ENABLED = os.getenv("FLIGHT_FAST_PATH", "1") != "0"
+
+# Calendriers des prix lancés en parallèle de la recherche principale
+_calendar_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CALENDAR_WORKERS", "8")), thread_name_prefix="calendar")
+
+_DATE_RE = re.compile(r"^\s*(\d{1,2})\s*[/.]\s*(\d{1,2})(?:\s*[/.]\s*(\d{2,4}))?\s*$")
+_FLEX_RE = re.compile(r"(?:±|\+\s*/?\s*-)\s*(\d{1,2})")
+
+
+def parse_date_fr(text, today=None):
+    """
+    "28/01" -> "2027-01-28" (prochaine occurrence), "28/01/2027" -> "2027-01-28".
+    None si la date est invalide.
+    """
+    match = _DATE_RE.match(text or "")
+    if not match:
+        return None
+
+    today = today or date.today()
+    day, month, year = match.groups()
+
+    try:
+        if year:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+            return date(year, int(month), int(day)).isoformat()
+
+        parsed = date(today.year, int(month), int(day))
+        if parsed < today:
+            parsed = date(today.year + 1, int(month), int(day))
+        return parsed.isoformat()
+    except ValueError:
+        return None
+
+
+def split_flex_window(text):
+    """
+    "28/01 - 30/01 ±3" -> ("28/01 - 30/01", 3) ; sans fenêtre -> (text, 0)
+    """
+    match = _FLEX_RE.search(text)
+    if not match:
+        return text, 0
+    return (text[:match.start()] + text[match.end():]).strip(), min(int(match.group(1)), 7)
+
+
+def _parse_budget(budget):
+    try:
+        return float(str(budget).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_trip(state):
+    """
+    Paramètres Amadeus depuis l'état de conversation, ou None si incompréhensible
+    (ville sans aéroport connu, date invalide)
+    """
+    origin = find_airport_code(state.get('depart', ''))
+    destination = find_airport_code(state.get('destination', ''))
+    departure_date = parse_date_fr(state.get('date_depart'))
+
+    return_date = None
+    if state.get('type_vol') == 'aller-retour':
+        # Retour = prochaine occurrence après le départ (28/12 - 03/01)
+        after = date.fromisoformat(departure_date) if departure_date else None
+        return_date = parse_date_fr(state.get('date_retour'), today=after)
+        if not return_date:
+            return None
+
+    if not (origin and destination and departure_date):
+        return None
+
+    return {
+        "origin": origin,
+        "destination": destination,
+        # Tous les aéroports des deux villes (MULTI_AIRPORT_MAX=1 : principal seulement)
+        "origins": expand_airports(origin),
+        "destinations": expand_airports(destination),
+        "departure_date": departure_date,
+        "return_date": return_date,
+        "max_price": _parse_budget(state.get('budget')),
+        "flex": int(state.get('flex') or 0)
+    }
+
+
+def search_flights_fast(state):
+    """
+    Recherche vol seul sans LLM : villes -> codes, dates -> ISO, Amadeus, gabarit.
+    Retourne le texte du résultat, ou None pour basculer sur la Crew.
+    """
+    trip = parse_trip(state)
+    if trip is None:
+        return None
+
+    api = AmadeusAPI()
+    calendar = calendar_future(trip, api) if trip["flex"] else None
+
+    offers = fetch_offers(trip, api)
+    if offers is None:
+        return None
+
+    return render_flights(state, trip, offers, calendar.result() if calendar else None)
+
+
+def fetch_offers(trip, api=None):
+    """
+    Offres de toutes les paires d'aéroports du voyage, fusionnées
+    """
+    return (api or AmadeusAPI()).search_multi_offers(
+        trip["origins"], trip["destinations"], trip["departure_date"], trip["return_date"]
+    )
+
+
+def calendar_future(trip, api=None):
+    """
+    Calendrier des prix du voyage en arrière-plan (retourne un Future)
+    """
+    context = contextvars.copy_context()
+    return _calendar_executor.submit(
+        context.run, (api or AmadeusAPI()).search_flexible,
+        trip["origin"], trip["destination"], trip["departure_date"], trip["return_date"], window=trip["flex"]
+    )
+
+
+def render_flights(state, trip, offers, calendar=None):
+    """
+    Gabarit du résultat vol seul (calendar : calendrier des prix, si demandé)
+    """
+    text = f"✈️ {state['depart']} ({'/'.join(trip['origins'])}) → {state['destination']} ({'/'.join(trip['destinations'])})\n"
+    text += f"📅 {state['date_depart']}{' - ' + state['date_retour'] if trip['return_date'] else ''}\n\n"
+
+    within_budget = rank_offers(offers, by="price", k=3, max_price=trip["max_price"])
+    if within_budget:
+        text += format_flights(within_budget)
+    elif offers:
+        text += f"⚠️ Aucun vol sous {state['budget']}€, voici les moins chers :\n\n"
+        text += format_flights(rank_offers(offers, by="price", k=3))
+    else:
+        text += "❌ Aucun vol trouvé à ces dates\n"
+
+    if calendar:
+        text += "\n" + format_price_calendar(calendar) + "\n"
+
+    return text
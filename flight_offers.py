@@ -0,0 +1,197 @@
+import heapq
+import re
+from dataclasses import dataclass
+
+# ========================================
+# MODÈLE
+# ========================================
+
+@dataclass(frozen=True, slots=True)
+class FlightOffer:
+    """
+    Offre de vol compacte, extraite une seule fois de la réponse Amadeus
+    """
+    offer_id: str
+    price: float
+    currency: str
+    carrier: str
+    origin: str
+    destination: str
+    departure_at: str
+    arrival_at: str
+    duration_minutes: int
+    stops: int
+    flight_numbers: tuple = ()
+    return_departure_at: str = None
+    return_arrival_at: str = None
+    return_duration_minutes: int = 0
+    return_stops: int = 0
+
+    @property
+    def total_duration_minutes(self):
+        return self.duration_minutes + self.return_duration_minutes
+
+    @property
+    def total_stops(self):
+        return self.stops + self.return_stops
+
+
+_DURATION_RE = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?")
+
+def parse_duration(value):
+    """
+    "PT2H35M" -> 155 (minutes)
+    """
+    match = _DURATION_RE.match(value or "")
+    if not match:
+        return 0
+    hours, minutes = match.groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+def parse_offer(offer):
+    """
+    Offre brute Amadeus -> FlightOffer
+    """
+    itineraries = offer["itineraries"]
+
+    # Premier itinéraire (aller)
+    segments = itineraries[0]["segments"]
+    fields = {
+        "offer_id": str(offer.get("id", "")),
+        "price": float(offer["price"]["total"]),
+        "currency": offer["price"].get("currency", "EUR"),
+        "carrier": segments[0]["carrierCode"],
+        "origin": segments[0]["departure"]["iataCode"],
+        "destination": segments[-1]["arrival"]["iataCode"],
+        "departure_at": segments[0]["departure"]["at"],
+        "arrival_at": segments[-1]["arrival"]["at"],
+        "duration_minutes": parse_duration(itineraries[0].get("duration")),
+        "stops": len(segments) - 1,
+        "flight_numbers": tuple(f"{s['carrierCode']}{s.get('number', '')}" for s in segments)
+    }
+
+    # Deuxième itinéraire (retour) si aller-retour
+    if len(itineraries) > 1:
+        back = itineraries[1]["segments"]
+        fields.update({
+            "return_departure_at": back[0]["departure"]["at"],
+            "return_arrival_at": back[-1]["arrival"]["at"],
+            "return_duration_minutes": parse_duration(itineraries[1].get("duration")),
+            "return_stops": len(back) - 1,
+            "flight_numbers": fields["flight_numbers"] + tuple(f"{s['carrierCode']}{s.get('number', '')}" for s in back)
+        })
+
+    return FlightOffer(**fields)
+
+
+def parse_offers(data):
+    """
+    Réponse flight-offers -> tuple de FlightOffer (offres illisibles ignorées)
+    """
+    offers = []
+
+    for offer in (data or {}).get("data", []):
+        try:
+            offers.append(parse_offer(offer))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"❌ Offre ignorée : {e}")
+
+    return tuple(offers)
+
+# ========================================
+# CLASSEMENT
+# ========================================
+
+DEFAULT_WEIGHTS = {"price": 1.0, "duration": 0.5, "stops": 0.3}
+
+def _score_key(offers, weights):
+    """
+    Score pondéré : chaque critère est ramené au meilleur de la liste
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    best_price = min(o.price for o in offers) or 1
+    best_duration = min(o.total_duration_minutes for o in offers) or 1
+
+    def key(offer):
+        return (
+            weights["price"] * offer.price / best_price
+            + weights["duration"] * offer.total_duration_minutes / best_duration
+            + weights["stops"] * offer.total_stops
+        )
+
+    return key
+
+
+RANK_KEYS = {
+    "price": lambda o: (o.price, o.total_duration_minutes),
+    "duration": lambda o: (o.total_duration_minutes, o.price),
+    "stops": lambda o: (o.total_stops, o.price)
+}
+
+def dedupe_offers(offers):
+    """
+    Même vol renvoyé par plusieurs requêtes : on garde l'offre la moins chère
+    """
+    best = {}
+    for offer in offers:
+        key = (offer.origin, offer.destination, offer.flight_numbers, offer.departure_at, offer.return_departure_at)
+        if key not in best or offer.price < best[key].price:
+            best[key] = offer
+    return tuple(best.values())
+
+
+def rank_offers(offers, by="price", k=3, max_price=None, weights=None):
+    """
+    Top-k des offres selon by ("price", "duration", "stops" ou "score"),
+    en excluant celles au-dessus de max_price
+    """
+    if max_price is not None:
+        offers = [o for o in offers if o.price <= max_price]
+
+    if not offers:
+        return []
+
+    if by == "score":
+        key = _score_key(offers, weights)
+    elif by in RANK_KEYS:
+        key = RANK_KEYS[by]
+    else:
+        raise ValueError(f"Critère de tri inconnu : {by}")
+
+    return heapq.nsmallest(k, offers, key=key)
+
+# ========================================
+# AFFICHAGE
+# ========================================
+
+def format_duration(minutes):
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}min" if minutes else f"{hours}h"
+
+
+def format_flights(offers):
+    """
+    Formate les offres retenues en texte lisible
+    """
+    if not offers:
+        return "❌ Aucun vol trouvé"
+
+    flights_text = "✈️ VOLS TROUVÉS :\n\n"
+
+    for i, offer in enumerate(offers, 1):
+        dep_time = offer.departure_at.split("T")[1][:5]
+        arr_time = offer.arrival_at.split("T")[1][:5]
+
+        flights_text += f"{i}. {offer.carrier} - {offer.price:.2f}€\n"
+        flights_text += f"   {offer.origin} {dep_time} → {offer.destination} {arr_time}\n"
+        flights_text += f"   Durée: {format_duration(offer.duration_minutes)} | Escales: {offer.stops}\n"
+
+        if offer.return_departure_at:
+            ret_dep = offer.return_departure_at.split("T")[1][:5]
+            ret_arr = offer.return_arrival_at.split("T")[1][:5]
+            flights_text += f"   Retour: {offer.destination} {ret_dep} → {offer.origin} {ret_arr} | Escales: {offer.return_stops}\n"
+
+        flights_text += "\n"
+
+    return flights_text
@@ -6,11 +6,8 @@ def format_travel_package_with_photos(package_text, destination):
     """
     api = PhotosAPI()
     
-    # Photos destination
-    city_photos = api.search_city_photos(destination, count=3)
-    
-    # Photos hôtels
-    hotel_photos = api.search_hotel_photos(destination, count=3)
+    # Photos destination + hôtels (en parallèle, depuis le cache si possible)
+    city_photos, hotel_photos = api.search_destination_photos(destination, count=3)
     
     result = package_text + "\n\n"
     result += "="*60 + "\n"
@@ -0,0 +1,382 @@
+import os
+import asyncio
+import contextvars
+import json
+import threading
+import time
+import weakref
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+
+import resilience
+
+# ========================================
+# CONFIGURATION
+# ========================================
+
+# Nombre d'hôtes distincts gardés en pool (Amadeus, Unsplash, Twilio...)
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+
+# Connexions keep-alive conservées par hôte
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+
+# Timeouts par défaut (connexion, lecture) en secondes
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Threads pour les requêtes doublées (hedging)
+HEDGE_WORKERS = int(os.getenv("HTTP_HEDGE_WORKERS", "32"))
+
+# Pool asyncio : connexions simultanées au total / par hôte
+ASYNC_POOL_LIMIT = int(os.getenv("HTTP_ASYNC_POOL_LIMIT", "200"))
+ASYNC_POOL_PER_HOST = int(os.getenv("HTTP_ASYNC_POOL_PER_HOST", "100"))
+
+_session = None
+_session_lock = threading.Lock()
+_host_adapters = {}
+
+# Une session aiohttp par boucle asyncio
+_async_sessions = weakref.WeakKeyDictionary()
+
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+_hedge_slots = threading.Semaphore(HEDGE_WORKERS)
+
+
+def get_session():
+    """
+    Session HTTP partagée (keep-alive, pools par hôte)
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                for prefix, host_adapter in _host_adapters.items():
+                    session.mount(prefix, host_adapter)
+                _session = session
+
+    return _session
+
+
+def configure_host(prefix, pool_maxsize):
+    """
+    Taille de pool dédiée pour un hôte
+    Exemple : configure_host("https://api.unsplash.com", 5)
+    """
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+
+    with _session_lock:
+        _host_adapters[prefix] = adapter
+        if _session is not None:
+            _session.mount(prefix, adapter)
+
+
+def request(method, url, upstream=None, hedge=False, **kwargs):
+    """
+    Requête via la session partagée, avec timeout par défaut borné par la
+    deadline en cours (resilience.deadline).
+
+    upstream : nom du service ("amadeus", "unsplash") -> disjoncteur et latences
+    hedge    : GET idempotent doublé si la réponse tarde au-delà du p95
+    """
+    kwargs["timeout"] = resilience.bound_timeout(kwargs.get("timeout", DEFAULT_TIMEOUT))
+
+    if upstream is None:
+        return get_session().request(method, url, **kwargs)
+
+    with resilience.breaker(upstream).guard() as breaker:
+        try:
+            if hedge and method == "GET":
+                response = _hedged(method, url, upstream, kwargs)
+            else:
+                response = _timed(method, url, upstream, kwargs)
+        except Exception:
+            # Timeout raccourci par la deadline : pas un échec du service
+            resilience.check_deadline()
+            raise
+        breaker.record(response.status_code)
+
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def _timed(method, url, upstream, kwargs):
+    start = time.monotonic()
+    response = get_session().request(method, url, **kwargs)
+    resilience.latency(upstream).observe(time.monotonic() - start)
+    return response
+
+
+def _hedged(method, url, upstream, kwargs):
+    """
+    Première requête ; si elle dépasse le p95, une seconde identique part
+    et la première réponse arrivée gagne (l'autre est ignorée)
+    """
+    tracker = resilience.latency(upstream)
+    delay = tracker.hedge_delay()
+
+    # Plus le temps de doubler avant la deadline : requête simple
+    left = resilience.remaining()
+    if left is not None and left <= delay:
+        return _timed(method, url, upstream, kwargs)
+
+    # Pool saturé : pas de doublement, la requête part sur le thread appelant
+    primary = _submit_hedge(method, url, upstream, kwargs)
+    if primary is None:
+        return _timed(method, url, upstream, kwargs)
+
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    backup = _submit_hedge(method, url, upstream, kwargs)
+    if backup is None:
+        return primary.result()
+    tracker.hedge_started()
+
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if future is backup:
+                tracker.hedge_won()
+            return response
+
+    raise error
+
+
+def _submit_hedge(method, url, upstream, kwargs):
+    """
+    Requête dans _hedge_executor seulement si un thread est libre, None sinon :
+    une attente en file serait comptée comme de la lenteur du service
+    """
+    if not _hedge_slots.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            return _timed(method, url, upstream, kwargs)
+        finally:
+            _hedge_slots.release()
+
+    return _hedge_executor.submit(contextvars.copy_context().run, run)
+
+
+def pool_stats():
+    """
+    Compteurs par hôte : une requête sans nouvelle connexion = hit
+    """
+    stats = {}
+    session = _session
+    if session is None:
+        return stats
+
+    adapters = {id(a): a for a in session.adapters.values()}
+
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            entry = stats.setdefault(host, {"requests": 0, "hits": 0, "misses": 0})
+            entry["requests"] += pool.num_requests
+            entry["misses"] += pool.num_connections
+            entry["hits"] += max(pool.num_requests - pool.num_connections, 0)
+
+    return stats
+
+
+def twilio_http_client():
+    """
+    Client HTTP Twilio branché sur la session partagée
+    """
+    from twilio.http.http_client import TwilioHttpClient
+
+    http_client = TwilioHttpClient(pool_connections=True, timeout=READ_TIMEOUT)
+    http_client.session = get_session()
+    return http_client
+
+
+# ========================================
+# TRANSPORT ASYNCIO
+# ========================================
+
+def get_async_session():
+    """
+    Session aiohttp partagée par la boucle courante (pool de connexions)
+    """
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_POOL_LIMIT, limit_per_host=ASYNC_POOL_PER_HOST)
+        timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _async_sessions[loop] = session
+
+    return session
+
+
+def async_timeout_kwargs():
+    """
+    {"timeout": ...} borné par la deadline en cours, {} sans deadline
+    """
+    left = resilience.remaining()
+    if left is None:
+        return {}
+
+    import aiohttp
+
+    return {"timeout": aiohttp.ClientTimeout(total=resilience.bound_timeout(left))}
+
+
+async def close_async_session():
+    """
+    Ferme la session de la boucle courante (à appeler avant la fin de la boucle)
+    """
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+class BufferedResponse:
+    """
+    Réponse aiohttp lue en entier, avec l'interface de requests.Response
+    utilisée par les clients (status_code, json(), raise_for_status())
+    """
+
+    def __init__(self, status_code, content, url):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+async def request_async(method, url, upstream=None, hedge=False, **kwargs):
+    """
+    Comme request(), sur la session aiohttp de la boucle courante : même
+    disjoncteur, mêmes latences et même hedging (avec des tâches, sans thread)
+    """
+    if "params" in kwargs:
+        kwargs["params"] = {k: str(v) for k, v in kwargs["params"].items()}
+    if "timeout" not in kwargs:
+        kwargs.update(async_timeout_kwargs())
+
+    if upstream is None:
+        return await _send_async(method, url, kwargs)
+
+    with resilience.breaker(upstream).guard() as breaker:
+        try:
+            if hedge and method == "GET":
+                response = await _hedged_async(method, url, upstream, kwargs)
+            else:
+                response = await _timed_async(method, url, upstream, kwargs)
+        except Exception:
+            resilience.check_deadline()
+            raise
+        breaker.record(response.status_code)
+
+    return response
+
+
+async def _send_async(method, url, kwargs):
+    async with get_async_session().request(method, url, **kwargs) as response:
+        return BufferedResponse(response.status, await response.read(), str(response.url))
+
+
+async def _timed_async(method, url, upstream, kwargs):
+    start = time.monotonic()
+    response = await _send_async(method, url, kwargs)
+    resilience.latency(upstream).observe(time.monotonic() - start)
+    return response
+
+
+async def _hedged_async(method, url, upstream, kwargs):
+    """
+    _hedged() en asyncio : la requête perdante est annulée
+    """
+    tracker = resilience.latency(upstream)
+    delay = tracker.hedge_delay()
+
+    left = resilience.remaining()
+    if left is not None and left <= delay:
+        return await _timed_async(method, url, upstream, kwargs)
+
+    primary = asyncio.ensure_future(_timed_async(method, url, upstream, kwargs))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result()
+
+        backup = asyncio.ensure_future(_timed_async(method, url, upstream, kwargs))
+        tasks.append(backup)
+        tracker.hedge_started()
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if task is backup:
+                    tracker.hedge_won()
+                return response
+
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def run_sync(coro):
+    """
+    Exécute sans boucle une coroutine qui ne s'interrompt jamais : c'est le
+    cas de la logique commune des clients quand leur transport est bloquant
+    (AmadeusAPI, PhotosAPI)
+    """
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+
+    coro.close()
+    raise RuntimeError("coroutine suspendue : transport asynchrone dans un client synchrone")
@@ -0,0 +1,149 @@
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+from lazy import ProcessThreads
+
+
+class QueueFull(Exception):
+    """
+    File d'attente pleine : la demande est refusée tout de suite
+    """
+
+    def __init__(self, depth):
+        super().__init__(f"File pleine ({depth} recherches en attente)")
+        self.depth = depth
+
+
+@dataclass
+class Job:
+    id: int
+    owner: str
+    state: str = "queued"
+    position: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    error: str = None
+
+
+class JobQueue:
+    """
+    File de recherches bornée, traitée par un nombre fixe de workers
+    """
+
+    def __init__(self, workers=4, max_depth=50, history=200):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.history = history
+
+        self._queue = queue.Queue()
+        self._waiting = deque()
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._running = 0
+        # Démarrés à la première soumission, à nouveau dans un enfant forké
+        self._threads = ProcessThreads(self._worker, workers, "search-worker", after_fork=self._after_fork)
+
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, owner=""):
+        """
+        Met une recherche en file.
+        job.position = nombre de recherches à attendre (0 = démarre tout de suite).
+        Lève QueueFull si la file a atteint max_depth.
+        """
+        self._threads.ensure_started()
+
+        with self._lock:
+            idle = self.workers - self._running
+            ahead = max(len(self._waiting) - idle, 0)
+            if ahead >= self.max_depth:
+                self.rejected += 1
+                raise QueueFull(ahead)
+
+            job = Job(id=next(self._ids), owner=owner)
+            self._waiting.append(job.id)
+            self._jobs[job.id] = job
+            self._trim_history()
+
+            job.position = max(len(self._waiting) - idle, 0)
+            self.submitted += 1
+
+        self._queue.put((job, fn, args))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        """
+        Compteurs par état + dernières recherches
+        """
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.state] += 1
+
+            return {
+                "workers": self.workers,
+                "max_depth": self.max_depth,
+                "depth": max(len(self._waiting) - (self.workers - self._running), 0),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "states": counts,
+                "recent": list(self._jobs.values())[-10:]
+            }
+
+    # ========================================
+    # WORKERS
+    # ========================================
+
+    def _after_fork(self):
+        # Enfant forké : les workers du parent et leurs recherches n'existent
+        # pas ici, et l'ancienne file réveillerait leurs attentes au lieu des nôtres
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting.clear()
+        self._running = 0
+        for job_id in [i for i, job in self._jobs.items() if job.state in ("queued", "running")]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job, fn, args = self._queue.get()
+
+            with self._lock:
+                self._waiting.remove(job.id)
+                self._running += 1
+                job.state = "running"
+                job.started_at = time.time()
+
+            try:
+                fn(*args)
+                job.state = "done"
+            except Exception as e:
+                print(f"❌ Recherche #{job.id} échouée : {e}")
+                job.state = "failed"
+                job.error = str(e)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    job.finished_at = time.time()
+                self._queue.task_done()
+
+    def _trim_history(self):
+        # On oublie les plus anciennes recherches terminées
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].state in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
@@ -0,0 +1,64 @@
+import functools
+import os
+import threading
+
+
+def per_process(factory):
+    """
+    Construit l'objet au premier appel, une seule fois par processus.
+    Un worker forké (gunicorn, pre-fork) reconstruit le sien au lieu
+    d'hériter des connexions et threads du maître.
+    """
+    lock = threading.Lock()
+    holder = {"pid": None, "value": None}
+
+    @functools.wraps(factory)
+    def get():
+        if holder["pid"] != os.getpid():
+            with lock:
+                if holder["pid"] != os.getpid():
+                    holder["value"] = factory()
+                    holder["pid"] = os.getpid()
+        return holder["value"]
+
+    def reset():
+        holder["pid"] = None
+        holder["value"] = None
+
+    get.reset = reset
+    return get
+
+
+class ProcessThreads:
+    """
+    Threads de fond démarrés au premier besoin, une fois par processus.
+    Un enfant forké hérite de la liste des threads du parent, qui n'existent
+    pas chez lui : il démarre les siens. after_fork() reconstruit avant cela
+    l'état hérité qui les référence (files, verrous, compteurs).
+    """
+
+    def __init__(self, target, count=1, name="worker", after_fork=None):
+        self.target = target
+        self.after_fork = after_fork
+        self.count = count
+        self.name = name
+        self.threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None and self.after_fork:
+                self.after_fork()
+            self.threads = []
+            for i in range(self.count):
+                name = self.name if self.count == 1 else f"{self.name}-{i + 1}"
+                thread = threading.Thread(target=self.target, name=name, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            self._pid = os.getpid()
@@ -0,0 +1,224 @@
+"""
+Compteurs, histogrammes et spans de latence, exposés au format texte Prometheus
+
+    with span("amadeus_search"):
+        ...
+
+Chaque recherche porte un identifiant de corrélation : les spans exécutés
+sous `correlation(cid)` sont aussi écrits dans les logs, préfixés par [cid].
+"""
+import contextvars
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Des millisecondes (webhook) aux minutes (Crew)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']!r}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """
+    Valeur lue au moment du rendu (taille de file, entrées en cache...)
+    """
+
+    def __init__(self, name, help, func):
+        self.name = name
+        self.help = help
+        self.func = func
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.func()
+        except Exception as e:
+            print(f"❌ Métrique {self.name} : {e}")
+            return lines
+
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            key = _label_key(dict(labels)) if labels else ()
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+# ========================================
+# REGISTRE
+# ========================================
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def counter(name, help):
+    return _register(Counter(name, help))
+
+
+def histogram(name, help, buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help, buckets))
+
+
+def gauge(name, help, func):
+    """
+    func() -> nombre, ou {((label, valeur), ...): nombre}
+    """
+    with _registry_lock:
+        _registry[name] = Gauge(name, help, func)
+        return _registry[name]
+
+
+def render():
+    """
+    Toutes les métriques au format texte Prometheus
+    """
+    with _registry_lock:
+        metrics = list(_registry.values())
+
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ========================================
+# SPANS ET CORRÉLATION
+# ========================================
+
+stage_seconds = histogram("travelbot_stage_seconds", "Durée de chaque étape (secondes)")
+stage_errors = counter("travelbot_stage_errors_total", "Étapes terminées par une exception")
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex[:8]
+
+
+def current_correlation_id():
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation(cid):
+    token = _correlation_id.set(cid)
+    try:
+        yield cid
+    finally:
+        _correlation_id.reset(token)
+
+
+@contextmanager
+def span(stage, **labels):
+    """
+    Mesure le bloc : histogramme par étape, compteur d'erreurs, log si corrélé
+    """
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start, error, **labels)
+
+
+def record_stage(stage, elapsed, error=False, **labels):
+    """
+    Étape chronométrée ailleurs (événements d'une bibliothèque) : comme un span
+    """
+    if error:
+        stage_errors.inc(stage=stage, **labels)
+    stage_seconds.observe(elapsed, stage=stage, **labels)
+
+    cid = _correlation_id.get()
+    if cid:
+        details = "".join(f" {k}={v}" for k, v in labels.items())
+        print(f"⏱️ [{cid}] {stage}{details} {elapsed * 1000:.0f} ms")
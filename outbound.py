@@ -0,0 +1,259 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from lazy import ProcessThreads
+
+
+class TokenBucket:
+    """
+    Limiteur de débit global : rate jetons/seconde, rafale max burst
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Bloque jusqu'à obtenir un jeton
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+# Limite Twilio du corps d'un message WhatsApp
+MAX_BODY = 1600
+
+
+def split_message(body, limit=MAX_BODY):
+    """
+    Découpe un texte trop long aux paragraphes, puis aux lignes, puis aux mots
+    """
+    parts = []
+    rest = body
+
+    while len(rest) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = rest.rfind(separator, 0, limit)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+
+        parts.append(rest[:cut].rstrip())
+        rest = rest[cut:].lstrip()
+
+    if rest or not parts:
+        parts.append(rest)
+    return parts
+
+
+def _is_retryable(error):
+    # Erreur client (numéro invalide, média refusé...) : inutile de réessayer
+    status = getattr(error, "status", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+
+class OutboundPipeline:
+    """
+    Messages sortants : ordre garanti par destinataire, débit global limité,
+    photos consécutives regroupées, nouvelles tentatives avec backoff.
+
+    send_func(to_number, body, media_urls) fait l'envoi réel et lève en cas d'erreur.
+    """
+
+    def __init__(self, send_func, rate=10.0, burst=10, workers=4, max_retries=3, backoff=1.0, max_media=None, max_body=MAX_BODY):
+        self.send_func = send_func
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_media = max_media
+        self.max_body = max_body
+
+        # destinataire -> messages en attente ; un destinataire n'est traité
+        # que par un worker à la fois, ce qui garantit l'ordre
+        self._pending = {}
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        # Démarrés au premier message, à nouveau dans un enfant forké
+        self._threads = ProcessThreads(self._worker, workers, "outbound", after_fork=self._after_fork)
+
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.merged = 0
+
+    # ========================================
+    # API
+    # ========================================
+
+    def send_text(self, to_number, body):
+        # Texte trop long : plusieurs messages à la suite plutôt qu'une troncature
+        for part in split_message(body, self.max_body):
+            self._enqueue(to_number, {"body": part, "media": []})
+
+    def send_photo(self, to_number, photo_url, caption=""):
+        self._enqueue(to_number, {"body": caption, "media": [photo_url]})
+
+    def send_photos(self, to_number, photos):
+        """
+        photos : liste de (url, légende), regroupées si le canal le permet
+        """
+        for url, caption in photos:
+            self.send_photo(to_number, url, caption)
+
+    def flush(self, timeout=None):
+        """
+        Attend que tous les messages en file soient partis
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._idle:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+
+        return True
+
+    def stats(self):
+        with self._lock:
+            waiting = sum(len(messages) for messages in self._pending.values())
+
+        return {
+            "waiting": waiting,
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "merged": self.merged
+        }
+
+    # ========================================
+    # FILE PAR DESTINATAIRE
+    # ========================================
+
+    def _enqueue(self, to_number, message):
+        self._threads.ensure_started()
+
+        with self._lock:
+            self.queued += 1
+            messages = self._pending.get(to_number)
+            if messages is None:
+                # Destinataire inactif : on le signale aux workers
+                self._pending[to_number] = deque([message])
+                self._ready.put(to_number)
+            else:
+                messages.append(message)
+
+    def _next_message(self, to_number):
+        """
+        Prochain message du destinataire, avec les photos suivantes fusionnées
+        """
+        with self._lock:
+            messages = self._pending[to_number]
+            message = messages.popleft()
+            limit = self._media_limit(to_number)
+
+            while message["media"] and messages and messages[0]["media"]:
+                if len(message["media"]) + len(messages[0]["media"]) > limit:
+                    break
+                extra = messages.popleft()
+                message = {
+                    "body": "\n".join(b for b in (message["body"], extra["body"]) if b),
+                    "media": message["media"] + extra["media"]
+                }
+                self.merged += 1
+
+            self._in_flight += 1
+            return message
+
+    def _media_limit(self, to_number):
+        if self.max_media:
+            return self.max_media
+        # WhatsApp : un média par message ; MMS : jusqu'à 10
+        return 1 if to_number.startswith("whatsapp:") else 10
+
+    def _after_fork(self):
+        # Enfant forké : les messages du parent restent au parent, et
+        # l'ancienne file réveillerait ses workers au lieu des nôtres
+        self._pending = {}
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+
+    def _worker(self):
+        while True:
+            to_number = self._ready.get()
+            message = self._next_message(to_number)
+
+            self._deliver(to_number, message)
+
+            with self._lock:
+                self._in_flight -= 1
+                if self._pending[to_number]:
+                    # Un message à la fois, puis on repasse la main (équité)
+                    self._ready.put(to_number)
+                else:
+                    del self._pending[to_number]
+                    if not self._pending and not self._in_flight:
+                        self._idle.notify_all()
+
+    def _deliver(self, to_number, message):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                self.send_func(to_number, message["body"], message["media"])
+                with self._lock:
+                    self.sent += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    print(f"❌ Erreur envoi à {to_number} : {e}")
+                    with self._lock:
+                        self.failed += 1
+                    return
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+
+def pipeline_from_env(send_func):
+    """
+    Pipeline configuré par variables d'environnement (OUTBOUND_*)
+    """
+    max_media = os.getenv("OUTBOUND_MAX_MEDIA")
+    return OutboundPipeline(
+        send_func,
+        rate=float(os.getenv("OUTBOUND_RATE", "10")),
+        burst=int(os.getenv("OUTBOUND_BURST", "10")),
+        workers=int(os.getenv("OUTBOUND_WORKERS", "4")),
+        max_retries=int(os.getenv("OUTBOUND_MAX_RETRIES", "3")),
+        backoff=float(os.getenv("OUTBOUND_BACKOFF", "1")),
+        max_media=int(max_media) if max_media else None,
+        max_body=int(os.getenv("OUTBOUND_MAX_BODY", str(MAX_BODY)))
+    )
@@ -1,113 +1,249 @@
 import os
-import requests
+import sys
+import asyncio
+import contextvars
+import http_transport
+from cache import TTLCache
+from functools import partial
+from http_transport import run_sync
+from metrics import span
+from resilience import map_in_context
+from concurrent.futures import ThreadPoolExecutor
 
-class PhotosAPI:
+# ========================================
+# CACHE PHOTOS
+# ========================================
+
+# Les résultats Unsplash d'une ville changent rarement : TTL long
+PHOTO_CACHE_TTL = int(os.getenv("PHOTO_CACHE_TTL", str(7 * 86400)))
+PHOTO_CACHE_SIZE = int(os.getenv("PHOTO_CACHE_SIZE", "2000"))
+PHOTO_CACHE_FILE = os.getenv("PHOTO_CACHE_FILE", "photo_cache.pkl")
+
+# Unsplash en panne : d'anciennes photos restent utilisables longtemps
+PHOTO_STALE_TTL = int(os.getenv("PHOTO_STALE_TTL", str(30 * 86400)))
+
+photo_cache = TTLCache(maxsize=PHOTO_CACHE_SIZE, ttl=PHOTO_CACHE_TTL, path=PHOTO_CACHE_FILE or None, stale_ttl=PHOTO_STALE_TTL)
+
+# Pool partagé pour les recherches ville + hôtel en parallèle
+_photo_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PHOTO_WORKERS", "8")), thread_name_prefix="photos")
+
+def photo_cache_key(kind, city, hotel_name=None, count=3):
+    return (
+        kind,
+        city.strip().lower(),
+        hotel_name.strip().lower() if hotel_name else None,
+        int(count)
+    )
+
+
+class _PhotosClient:
     """
-    Récupère photos haute qualité pour hôtels/villes
+    Logique commune aux clients Unsplash synchrone et asynchrone, écrite une
+    seule fois en coroutines (cache, repli sur le cache expiré, requête) ;
+    chaque client fournit son transport : _send et _gather
     """
-    
+
     def __init__(self):
         self.access_key = os.getenv("UNSPLASH_ACCESS_KEY")
-        self.base_url = "https://api.unsplash.com"
-    
-    def search_hotel_photos(self, city, hotel_name=None, count=3):
-        """
-        Recherche photos d'hôtels
-        """
+        self.base_url = os.getenv("UNSPLASH_BASE_URL", "https://api.unsplash.com").rstrip("/")
+
+    def _hotel_query(self, city, hotel_name=None):
         if hotel_name:
-            query = f"{hotel_name} hotel {city}"
-        else:
-            query = f"luxury hotel {city}"
-        
-        url = f"{self.base_url}/search/photos"
-        
-        params = {
+            return f"{hotel_name} hotel {city}"
+        return f"luxury hotel {city}"
+
+    def _city_query(self, city):
+        return f"{city} landmarks architecture"
+
+    def _search_params(self, query, count):
+        return {
             "query": query,
             "per_page": count,
             "orientation": "landscape"
         }
-        
-        headers = {
+
+    def _headers(self):
+        return {
             "Authorization": f"Client-ID {self.access_key}"
         }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            photos = []
-            
-            for result in data.get("results", []):
-                photos.append({
-                    "url": result["urls"]["regular"],
-                    "thumb": result["urls"]["thumb"],
-                    "description": result.get("alt_description", "Hôtel"),
-                    "photographer": result["user"]["name"]
-                })
-            
+
+    def _parse_photos(self, data, default_description):
+        photos = []
+
+        for result in data.get("results", []):
+            photos.append({
+                "url": result["urls"]["regular"],
+                "thumb": result["urls"]["thumb"],
+                "description": result.get("alt_description", default_description),
+                "photographer": result["user"]["name"]
+            })
+
+        return photos
+
+    async def _search_hotel_photos(self, city, hotel_name=None, count=3):
+        key = photo_cache_key("hotel", city, hotel_name, count)
+        return await self._cached(key, self._hotel_query(city, hotel_name), count, "Hôtel")
+
+    async def _search_city_photos(self, city, count=3):
+        key = photo_cache_key("city", city, None, count)
+        return await self._cached(key, self._city_query(city), count, city)
+
+    async def _search_destination_photos(self, city, hotel_name=None, count=3):
+        city_photos, hotel_photos = await self._gather([
+            partial(self._search_city_photos, city, count),
+            partial(self._search_hotel_photos, city, hotel_name, count)
+        ])
+        return city_photos, hotel_photos
+
+    async def _cached(self, key, query, count, default_description):
+        photos = photo_cache.get(key)
+        if photos is not None:
+            return photos
+
+        photos = await self._search(query, count, default_description)
+        # Liste vide = erreur ou aucun résultat : on ne la garde pas
+        if photos:
+            photo_cache.set(key, photos)
             return photos
-        
+
+        return photo_cache.get_stale(key, [])
+
+    async def _search(self, query, count, default_description):
+        url = f"{self.base_url}/search/photos"
+
+        try:
+            with span("unsplash"):
+                response = await self._send(
+                    "GET", url, upstream="unsplash", hedge=True,
+                    headers=self._headers(), params=self._search_params(query, count)
+                )
+                response.raise_for_status()
+
+            return self._parse_photos(response.json(), default_description)
+
         except Exception as e:
             print(f"❌ Erreur photos : {e}")
             return []
-    
+
+
+class PhotosAPI(_PhotosClient):
+    """
+    Récupère photos haute qualité pour hôtels/villes (transport bloquant,
+    coroutines communes exécutées sans boucle)
+    """
+
+    def search_hotel_photos(self, city, hotel_name=None, count=3):
+        """
+        Recherche photos d'hôtels
+        """
+        return run_sync(self._search_hotel_photos(city, hotel_name, count))
+
     def search_city_photos(self, city, count=3):
         """
         Recherche photos de ville
         """
-        url = f"{self.base_url}/search/photos"
-        
-        params = {
-            "query": f"{city} landmarks architecture",
-            "per_page": count,
-            "orientation": "landscape"
-        }
-        
-        headers = {
-            "Authorization": f"Client-ID {self.access_key}"
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            photos = []
-            
-            for result in data.get("results", []):
-                photos.append({
-                    "url": result["urls"]["regular"],
-                    "thumb": result["urls"]["thumb"],
-                    "description": result.get("alt_description", city),
-                    "photographer": result["user"]["name"]
-                })
-            
-            return photos
-        
-        except Exception as e:
-            print(f"❌ Erreur photos : {e}")
-            return []
+        return run_sync(self._search_city_photos(city, count))
+
+    def search_destination_photos(self, city, hotel_name=None, count=3):
+        """
+        Photos ville + hôtels récupérées en parallèle
+        Retourne (city_photos, hotel_photos)
+        """
+        return run_sync(self._search_destination_photos(city, hotel_name, count))
+
+    async def _send(self, method, url, **kwargs):
+        return http_transport.request(method, url, **kwargs)
+
+    async def _gather(self, calls):
+        return map_in_context(_photo_executor, lambda call: run_sync(call()), calls)
+
+
+class AsyncPhotosAPI(_PhotosClient):
+    """
+    Version asyncio de PhotosAPI (même format de retour)
+    """
+
+    async def search_hotel_photos(self, city, hotel_name=None, count=3):
+        """
+        Recherche photos d'hôtels
+        """
+        return await self._search_hotel_photos(city, hotel_name, count)
+
+    async def search_city_photos(self, city, count=3):
+        """
+        Recherche photos de ville
+        """
+        return await self._search_city_photos(city, count)
+
+    async def search_destination_photos(self, city, hotel_name=None, count=3):
+        """
+        Photos ville + hôtels récupérées en parallèle
+        Retourne (city_photos, hotel_photos)
+        """
+        return await self._search_destination_photos(city, hotel_name, count)
+
+    async def _send(self, method, url, **kwargs):
+        return await http_transport.request_async(method, url, **kwargs)
+
+    async def _gather(self, calls):
+        return await asyncio.gather(*(call() for call in calls))
+
+
+def city_photos_future(city, count=3):
+    """
+    Lance la recherche photos ville en arrière-plan (retourne un Future)
+    """
+    # Le contexte suit la tâche : les spans gardent l'identifiant de la recherche
+    context = contextvars.copy_context()
+    return _photo_executor.submit(context.run, PhotosAPI().search_city_photos, city, count)
+
+
+def prewarm_photos(cities=None, count=3, workers=4):
+    """
+    Remplit le cache (ville + hôtels) pour toutes les villes connues
+    """
+    if cities is None:
+        from amadeus_tool import AIRPORT_CODES
+        cities = [city.title() for city in AIRPORT_CODES]
+
+    api = PhotosAPI()
+
+    # Pool séparé : search_destination_photos utilise déjà _photo_executor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda city: api.search_destination_photos(city, count=count), cities))
+
+    for city, (city_photos, hotel_photos) in zip(cities, results):
+        print(f"📸 {city} : {len(city_photos)} photos ville, {len(hotel_photos)} photos hôtels")
+
+    if photo_cache.path:
+        photo_cache.save()
+    return photo_cache.stats()
 
 # Test
+# python photos_api.py            -> test Paris
+# python photos_api.py --prewarm  -> préchauffe le cache
 if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
-    
+
+    if "--prewarm" in sys.argv:
+        print(f"✅ Cache photos prêt : {prewarm_photos()}")
+        sys.exit(0)
+
     api = PhotosAPI()
-    
+
     print("📸 Test photos Paris...")
-    
+
     # Photos hôtels Paris
     hotel_photos = api.search_hotel_photos("Paris", count=3)
     print(f"\n🏨 {len(hotel_photos)} photos d'hôtels trouvées")
     for i, photo in enumerate(hotel_photos, 1):
         print(f"{i}. {photo['description']}")
         print(f"   URL : {photo['url'][:50]}...")
-    
+
     # Photos ville Paris
     city_photos = api.search_city_photos("Paris", count=3)
     print(f"\n🗼 {len(city_photos)} photos de Paris trouvées")
     for i, photo in enumerate(city_photos, 1):
         print(f"{i}. {photo['description']}")
-        print(f"   URL : {photo['url'][:50]}...")
\ No newline at end of file
+        print(f"   URL : {photo['url'][:50]}...")
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from amadeus_tool import find_airport_code
+from fast_path import fetch_offers, parse_trip
+from photos_api import PhotosAPI, photo_cache_key
+
+# Préchargement pendant la conversation (PREFETCH=0 pour désactiver)
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1") != "0"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+# Conversation abandonnée : le préchargement est compté comme perdu après ce délai
+PREFETCH_TTL = int(os.getenv("PREFETCH_TTL", "1800"))
+
+
+def _warm_destination(city):
+    # Index aéroports + photos ville : ce que traiter_recherche demandera en premier
+    find_airport_code(city)
+    PhotosAPI().search_city_photos(city, count=3)
+
+
+def _warm_flights(trip):
+    fetch_offers(trip)
+
+
+def prefetch_keys(state):
+    """
+    Ce que la recherche finale va demander, d'après l'état actuel :
+    {type: (clé, fonction, argument)}
+    """
+    keys = {}
+
+    if state.get('destination'):
+        city = state['destination']
+        keys["destination"] = (photo_cache_key("city", city), _warm_destination, city)
+
+    # Dates comprises : la requête Amadeus est connue (le budget ne change pas la clé)
+    if state.get('date_depart') and state.get('type_vol'):
+        trip = parse_trip(state)
+        if trip:
+            key = (trip["origins"], trip["destinations"], trip["departure_date"], trip["return_date"])
+            keys["flights"] = (key, _warm_flights, trip)
+
+    return keys
+
+
+class Prefetcher:
+    """
+    Préchargements spéculatifs par utilisateur, relancés à chaque étape.
+    Une valeur qui change (autre destination, autres dates) annule l'ancienne.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS, ttl=PREFETCH_TTL, enabled=PREFETCH_ENABLED):
+        self.enabled = enabled
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.cancelled = 0
+
+    def on_step(self, user, state):
+        """
+        Appelé après chaque changement d'étape de la conversation
+        """
+        if not self.enabled:
+            return
+
+        wanted = prefetch_keys(state)
+
+        with self._lock:
+            self._expire()
+            pending = self._pending.setdefault(user, {"at": time.monotonic(), "items": {}})
+            pending["at"] = time.monotonic()
+            items = pending["items"]
+
+            for kind in list(items):
+                if kind not in wanted or wanted[kind][0] != items[kind][0]:
+                    self._drop(items.pop(kind))
+
+            for kind, (key, func, arg) in wanted.items():
+                if kind not in items:
+                    items[kind] = (key, self._executor.submit(self._run, kind, func, arg))
+                    self.started += 1
+
+            if not items:
+                del self._pending[user]
+
+    def consume(self, user, state):
+        """
+        Confirmation : les préchargements qui correspondent à la demande sont
+        des succès, les autres sont perdus
+        """
+        with self._lock:
+            pending = self._pending.pop(user, None)
+        if not pending:
+            return
+
+        wanted = prefetch_keys(state)
+        with self._lock:
+            for kind, item in pending["items"].items():
+                if kind in wanted and wanted[kind][0] == item[0]:
+                    self.hits += 1
+                else:
+                    self._drop(item)
+
+    def stats(self):
+        with self._lock:
+            done = self.hits + self.wasted + self.cancelled
+            return {
+                "pending": sum(len(p["items"]) for p in self._pending.values()),
+                "started": self.started,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "cancelled": self.cancelled,
+                "hit_rate": self.hits / done if done else 0.0
+            }
+
+    def _run(self, kind, func, arg):
+        try:
+            func(arg)
+        except Exception as e:
+            print(f"❌ Préchargement {kind} : {e}")
+
+    def _drop(self, item):
+        # Pas encore démarré : rien n'a été dépensé
+        if item[1].cancel():
+            self.cancelled += 1
+        else:
+            self.wasted += 1
+
+    def _expire(self):
+        limit = time.monotonic() - self.ttl
+        for user in [u for u, p in self._pending.items() if p["at"] < limit]:
+            for item in self._pending.pop(user)["items"].values():
+                self._drop(item)
@@ -0,0 +1,280 @@
+"""
+Deadlines, disjoncteurs et latences par service externe (Amadeus, Unsplash...)
+
+    with deadline(120):          # toute la recherche
+        http_transport.get(url, upstream="amadeus", hedge=True)
+
+La deadline suit le contexte (contextvars) : les appels faits plus bas,
+même dans un pool de threads via map_in_context, la respectent.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+
+# Disjoncteur : N échecs consécutifs -> ouvert pendant RESET secondes
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# Requête doublée si la première dépasse le p95 observé (borné)
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2"))
+HEDGE_MIN_SAMPLES = 20
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+
+    def __init__(self, upstream):
+        super().__init__(f"{upstream} indisponible (disjoncteur ouvert)")
+        self.upstream = upstream
+
+# ========================================
+# DEADLINE
+# ========================================
+
+@contextmanager
+def deadline(seconds):
+    """
+    Temps max pour tout le bloc ; une deadline englobante plus courte reste prioritaire
+    """
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(at, current) if current else at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """
+    Secondes restantes avant la deadline, None s'il n'y en a pas
+    """
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.monotonic()
+
+
+def bound_timeout(timeout):
+    """
+    Timeout (connexion, lecture) raccourci au temps restant ; lève si dépassé
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("deadline de la recherche dépassée")
+
+    if isinstance(timeout, tuple):
+        return tuple(min(t, left) for t in timeout)
+    return min(timeout, left) if timeout else left
+
+
+def check_deadline():
+    """
+    Lève DeadlineExceeded si la deadline en cours est passée
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("deadline de la recherche dépassée")
+
+
+def map_in_context(executor, fn, items, limit=None):
+    """
+    executor.map qui transmet le contexte (deadline, corrélation) à chaque tâche.
+    limit : tâches de cet appel en cours à la fois (pool partagé entre appels)
+    """
+    items = list(items)
+    if limit is None or limit >= len(items):
+        futures = [executor.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    results = [None] * len(items)
+    pending = {}
+    for index, item in enumerate(items):
+        if len(pending) >= limit:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+        pending[executor.submit(contextvars.copy_context().run, fn, item)] = index
+
+    for future, index in pending.items():
+        results[index] = future.result()
+    return results
+
+# ========================================
+# DISJONCTEURS
+# ========================================
+
+class CircuitBreaker:
+    """
+    closed -> (N échecs) -> open -> (RESET s) -> half_open : un seul essai
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.name = name
+        self.max_failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record(self, status):
+        """
+        Code HTTP reçu : 5xx et 429 comptent comme des échecs
+        """
+        if status >= 500 or status == 429:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.max_failures:
+                if self.state != "open":
+                    self.opened += 1
+                    print(f"❌ {self.name} dégradé : disjoncteur ouvert {self.reset_timeout:.0f}s")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """
+        Lève CircuitOpen si ouvert ; une exception dans le bloc compte comme un échec
+        """
+        if not self.allow():
+            raise CircuitOpen(self.name)
+        try:
+            yield self
+        except DeadlineExceeded:
+            # Deadline de l'utilisateur, pas une panne du service
+            self._release_probe()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Annulation (tâche asyncio) : ni succès ni échec
+            self._release_probe()
+            raise
+
+    def _release_probe(self):
+        with self._lock:
+            self._probing = False
+
+# ========================================
+# LATENCES (délai de hedging)
+# ========================================
+
+class LatencyTracker:
+    """
+    Fenêtre glissante des durées de réponse d'un service
+    """
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def hedge_started(self):
+        with self._lock:
+            self.hedged += 1
+
+    def hedge_won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def hedge_delay(self):
+        p95 = self.p95()
+        return max(HEDGE_MIN_DELAY, p95 if p95 is not None else HEDGE_DEFAULT_DELAY)
+
+
+_breakers = {}
+_trackers = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(upstream):
+    with _registry_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(upstream)
+        return _breakers[upstream]
+
+
+def latency(upstream):
+    with _registry_lock:
+        if upstream not in _trackers:
+            _trackers[upstream] = LatencyTracker()
+        return _trackers[upstream]
+
+
+def upstream_stats():
+    """
+    État par service : disjoncteur, p95, requêtes doublées
+    """
+    with _registry_lock:
+        names = sorted(set(_breakers) | set(_trackers))
+
+    stats = {}
+    for name in names:
+        b = breaker(name)
+        t = latency(name)
+        stats[name] = {
+            "state": b.state,
+            "opened": b.opened,
+            "rejected": b.rejected,
+            "p95": t.p95(),
+            "hedged": t.hedged,
+            "hedge_wins": t.hedge_wins
+        }
+    return stats
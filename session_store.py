@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class SessionStore:
+    """
+    États de conversation : front LRU + TTL en mémoire, SQLite persistant.
+
+    Les sessions sont gardées encodées (JSON, compressé au-delà de
+    compress_min octets) : chaque lecture rend une copie indépendante.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, path="sessions.db", max_resident=1000, ttl=7 * 86400, compress_min=512):
+        self.path = path
+        self.max_resident = max_resident
+        self.ttl = ttl
+        self.compress_min = compress_min
+
+        # utilisateur -> (dernière écriture, blob)
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ========================================
+    # API
+    # ========================================
+
+    def get(self, user):
+        """
+        Copie de la session, ou None si absente / expirée
+        """
+        blob = self._load(user)
+        return self._decode(blob) if blob is not None else None
+
+    def set(self, user, state):
+        self._store(user, self._encode(state))
+
+    def delete(self, user):
+        with self._lock:
+            self._resident.pop(user, None)
+
+        if self.path:
+            with self._db_lock:
+                db = self._connection()
+                db.execute("DELETE FROM sessions WHERE user = ?", (user,))
+                db.commit()
+
+    def update(self, user, **fields):
+        """
+        Mise à jour atomique de quelques champs
+        """
+        with self.transaction(user) as state:
+            state.update(fields)
+            return dict(state)
+
+    @contextmanager
+    def transaction(self, user):
+        """
+        Lecture-modification-écriture atomique pour un utilisateur.
+        Session vide en sortie = session supprimée.
+        """
+        with self._user_lock(user):
+            state = self.get(user) or {}
+            yield state
+
+            if state:
+                self.set(user, state)
+            else:
+                self.delete(user)
+
+    def __contains__(self, user):
+        return self._load(user) is not None
+
+    def stats(self):
+        with self._lock:
+            resident_bytes = sum(len(blob) for _, blob in self._resident.values())
+            return {
+                "resident": len(self._resident),
+                "max_resident": self.max_resident,
+                "resident_bytes": resident_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    # ========================================
+    # FRONT MÉMOIRE
+    # ========================================
+
+    def _user_lock(self, user):
+        return self._user_locks[hash(user) % self.LOCK_STRIPES]
+
+    def _load(self, user):
+        now = time.time()
+
+        with self._lock:
+            entry = self._resident.get(user)
+            if entry is not None:
+                if entry[0] + self.ttl >= now:
+                    self._resident.move_to_end(user)
+                    self.hits += 1
+                    return entry[1]
+                del self._resident[user]
+
+            self.misses += 1
+
+        if not self.path:
+            return None
+
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT data, updated_at FROM sessions WHERE user = ? AND updated_at >= ?",
+                (user, now - self.ttl)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        blob, updated_at = row
+        self._remember(user, updated_at, blob)
+        return blob
+
+    def _store(self, user, blob):
+        now = time.time()
+        self._remember(user, now, blob)
+
+        if not self.path:
+            return
+
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (user, data, updated_at) VALUES (?, ?, ?)",
+                (user, blob, now)
+            )
+
+            # Purge périodique des sessions expirées
+            self._writes += 1
+            if self._writes % 500 == 0:
+                db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+
+            db.commit()
+
+    def _remember(self, user, updated_at, blob):
+        with self._lock:
+            self._resident[user] = (updated_at, blob)
+            self._resident.move_to_end(user)
+
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+                self.evictions += 1
+
+    # ========================================
+    # ENCODAGE / SQLITE
+    # ========================================
+
+    def _encode(self, state):
+        raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(raw) >= self.compress_min:
+            return b"z" + zlib.compress(raw)
+        return b"j" + raw
+
+    def _decode(self, blob):
+        raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+        return json.loads(raw)
+
+    def _connection(self):
+        # Une connexion par processus (compatible pre-fork), verrou déjà acquis
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "user TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            db.commit()
+            self._db = db
+            self._db_pid = os.getpid()
+
+        return self._db
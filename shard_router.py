@@ -0,0 +1,327 @@
+"""
+Routeur webhook : chaque numéro WhatsApp va toujours au même worker
+
+    python shard_router.py --workers 8       # 8 workers locaux + routeur sur :5000
+    SHARD_NODES=http://10.0.0.2:5000,http://10.0.0.3:5000 SHARD_SECRET=... python shard_router.py --workers 0
+    python shard_router.py --workers 6 --plan
+
+Twilio appelle le routeur, qui transmet /whatsapp au worker propriétaire du
+numéro (sharding.HashRing). Un worker est un create_app() ordinaire : session,
+verrou par utilisateur, recherches en cours et réponses rejouées (MessageSid)
+restent dans un seul processus. Les workers locaux partagent SESSION_DB.
+
+Rééquilibrage (ajout ou retrait de workers) :
+  1. relancer le routeur avec SHARD_PREVIOUS_NODES = ancien anneau et
+     SHARD_NODES (ou --workers) = nouveau, les mêmes SHARD_SECRET partout ;
+  2. au premier message d'un utilisateur déplacé, sa session passe de l'ancien
+     worker au nouveau (/_shard/handoff puis /_shard/adopt) ; pendant sa
+     recherche, l'utilisateur reste sur l'ancien worker ;
+  3. après SESSION_TTL, retirer SHARD_PREVIOUS_NODES et arrêter les workers
+     retirés (les sessions non migrées ont alors expiré).
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+
+from flask import Flask, request
+
+import http_transport
+import metrics
+from cache import TTLCache
+from sharding import HashRing, ring_from_env, shard_key
+
+# Twilio abandonne le webhook au bout de 15 s
+FORWARD_TIMEOUT = float(os.getenv("SHARD_FORWARD_TIMEOUT", "14"))
+
+# Utilisateurs déjà migrés : gardés aussi longtemps qu'une session
+MOVED_TTL = int(os.getenv("SESSION_TTL", str(7 * 86400)))
+MOVED_MAX = int(os.getenv("SHARD_MOVED_MAX", "100000"))
+
+# En-têtes Twilio transmis au worker
+FORWARD_HEADERS = ("X-Twilio-Signature", "User-Agent")
+
+
+class ShardRouter:
+    """
+    Numéro -> worker ; pendant un rééquilibrage, déplace les sessions au fil des messages
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, ring, previous=None, secret=None):
+        self.ring = ring
+        self.previous = previous
+        self.secret = secret if secret is not None else os.getenv("SHARD_SECRET", "")
+
+        self._moved = TTLCache(maxsize=MOVED_MAX, ttl=MOVED_TTL)
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+
+        self.forwarded = {}
+        self.failed = {}
+        self.handoffs = dict.fromkeys(("moved", "empty", "busy", "failed"), 0)
+
+    def forward(self, from_number, form, headers=None):
+        """
+        Transmet le webhook au worker du numéro : (corps, code, en-têtes)
+        """
+        key = shard_key(from_number)
+        node = self.ring.node_for(key)
+        old = self.previous.node_for(key) if self.previous else node
+
+        if old == node or self._moved.get(key):
+            return self._send(node, form, headers)
+
+        # Utilisateur déplacé : migration puis envoi, un message du numéro à la fois
+        with self._locks[hash(key) % self.LOCK_STRIPES]:
+            if not self._moved.get(key) and not self._handoff(key, from_number, old, node):
+                node = old
+            return self._send(node, form, headers)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "forwarded": dict(self.forwarded),
+                "failed": dict(self.failed),
+                "handoffs": dict(self.handoffs),
+                "migrated": len(self._moved)
+            }
+
+    def _send(self, node, form, headers):
+        try:
+            with metrics.span("shard_forward", node=node):
+                response = http_transport.post(
+                    f"{node}/whatsapp", data=form, headers=headers or {},
+                    timeout=FORWARD_TIMEOUT, upstream=node
+                )
+        except Exception as e:
+            self._count(self.failed, node)
+            print(f"❌ Worker {node} injoignable : {e}")
+            return "", 503, {}
+
+        self._count(self.forwarded, node)
+        return response.content, response.status_code, {
+            "Content-Type": response.headers.get("Content-Type", "text/xml")
+        }
+
+    def _handoff(self, key, from_number, old, new):
+        """
+        Session de old vers new ; False si l'utilisateur doit rester sur old
+        """
+        try:
+            response = self._internal(old, "handoff", {"From": from_number})
+            if response.status_code == 409:
+                self._count(self.handoffs, "busy")
+                return False
+            response.raise_for_status()
+            session = response.json()
+        except Exception as e:
+            self._count(self.handoffs, "failed")
+            print(f"❌ Migration …{from_number[-4:]} depuis {old} : {e}")
+            return False
+
+        if session:
+            try:
+                self._internal(new, "adopt", {"From": from_number, "session": response.text}).raise_for_status()
+            except Exception as e:
+                print(f"❌ Migration …{from_number[-4:]} vers {new} : {e}")
+                self._count(self.handoffs, "failed")
+                # Rendue à l'ancien worker plutôt que perdue
+                try:
+                    self._internal(old, "adopt", {"From": from_number, "session": response.text})
+                except Exception as erreur:
+                    print(f"❌ Session …{from_number[-4:]} perdue : {erreur}")
+                return False
+
+        self._moved.set(key, True)
+        self._count(self.handoffs, "moved" if session else "empty")
+        return True
+
+    def _internal(self, node, action, data):
+        return http_transport.post(
+            f"{node}/_shard/{action}", data=data, headers={"X-Shard-Secret": self.secret},
+            timeout=FORWARD_TIMEOUT, upstream=node
+        )
+
+    def _count(self, counts, name):
+        with self._stats_lock:
+            counts[name] = counts.get(name, 0) + 1
+
+
+def create_router(router):
+    """
+    Application Flask du routeur : /whatsapp transmis, /status et /metrics locaux
+    """
+    app = Flask(__name__)
+
+    def webhook():
+        headers = {h: request.headers[h] for h in FORWARD_HEADERS if h in request.headers}
+        return router.forward(request.values.get('From', ''), request.form.to_dict(flat=False), headers)
+
+    def status():
+        stats = router.stats()
+        lignes = [f"✅ Routeur actif : {len(router.ring.nodes)} workers"]
+
+        for node, share in router.ring.shares().items():
+            lignes.append(
+                f"🧩 {node} : {share:.0%} des numéros, {stats['forwarded'].get(node, 0)} transmis, "
+                f"{stats['failed'].get(node, 0)} échecs"
+            )
+
+        if router.previous:
+            migrations = stats['handoffs']
+            lignes.append(
+                f"🔀 Rééquilibrage : {router.previous.moved(router.ring):.0%} des numéros déplacés, "
+                f"{migrations['moved']} sessions migrées, {migrations['empty']} sans session, "
+                f"{migrations['busy']} en recherche, {migrations['failed']} échecs"
+            )
+
+        return "\n".join(lignes), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+    def metrics_endpoint():
+        return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    metrics.gauge(
+        "travelbot_shard_forwarded", "Webhooks transmis, par worker",
+        lambda: {(("node", k),): v for k, v in router.stats()['forwarded'].items()}
+    )
+    metrics.gauge(
+        "travelbot_shard_forward_failed", "Webhooks non transmis (worker injoignable), par worker",
+        lambda: {(("node", k),): v for k, v in router.stats()['failed'].items()}
+    )
+    metrics.gauge(
+        "travelbot_shard_handoffs", "Migrations de session pendant un rééquilibrage, par issue",
+        lambda: {(("result", k),): v for k, v in router.stats()['handoffs'].items()}
+    )
+
+    app.add_url_rule("/whatsapp", view_func=webhook, methods=['POST'])
+    app.add_url_rule("/status", view_func=status, methods=['GET'])
+    app.add_url_rule("/metrics", view_func=metrics_endpoint, methods=['GET'])
+    return app
+
+# ========================================
+# WORKERS LOCAUX
+# ========================================
+
+def _serve_worker(port, quiet):
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+
+    # Processus neuf (spawn) : le bot est importé ici, pas dans le routeur
+    from whatsapp_travel_bot import create_app
+    create_app().run(host="127.0.0.1", port=port, threaded=True)
+
+
+class LocalWorkers:
+    """
+    Un processus create_app() par port, relancé s'il meurt
+    """
+
+    def __init__(self, ports, quiet=False):
+        self.ports = list(ports)
+        self.quiet = quiet
+        self.nodes = [f"http://127.0.0.1:{port}" for port in self.ports]
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = {}
+        self._stop = threading.Event()
+
+    def start(self, timeout=30):
+        for port in self.ports:
+            self._spawn(port)
+        threading.Thread(target=self._supervise, name="workers", daemon=True).start()
+
+        for port in self.ports:
+            if not _wait_port(port, timeout):
+                print(f"❌ Worker :{port} pas prêt après {timeout:.0f}s")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(5)
+
+    def pids(self):
+        return [process.pid for process in self._processes.values() if process.is_alive()]
+
+    def _spawn(self, port):
+        process = self._context.Process(target=_serve_worker, args=(port, self.quiet), name=f"worker-{port}", daemon=True)
+        process.start()
+        self._processes[port] = process
+
+    def _supervise(self):
+        while not self._stop.wait(1):
+            for port, process in list(self._processes.items()):
+                if not process.is_alive() and not self._stop.is_set():
+                    print(f"❌ Worker :{port} arrêté (code {process.exitcode}), relance")
+                    self._spawn(port)
+
+
+def _wait_port(port, timeout):
+    limit = time.monotonic() + timeout
+    while time.monotonic() < limit:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def afficher_plan(ring, previous):
+    for node, share in ring.shares().items():
+        print(f"🧩 {node} : {share:.1%} des numéros")
+    if previous:
+        print(
+            f"🔀 {len(previous.nodes)} -> {len(ring.nodes)} workers : "
+            f"{previous.moved(ring):.1%} des numéros changent de worker"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers locaux (0 : SHARD_NODES)")
+    parser.add_argument("--host", default="127.0.0.1", help="interface du routeur")
+    parser.add_argument("--port", type=int, default=5000, help="port du routeur (webhook Twilio)")
+    parser.add_argument("--worker-port", type=int, default=5101, help="port du premier worker local")
+    parser.add_argument("--plan", action="store_true", help="afficher la répartition et quitter")
+    args = parser.parse_args()
+
+    if args.workers:
+        ports = range(args.worker_port, args.worker_port + args.workers)
+        ring = HashRing([f"http://127.0.0.1:{port}" for port in ports])
+        # Hérité par les workers locaux (spawn copie l'environnement)
+        os.environ.setdefault("SHARD_SECRET", secrets.token_hex(16))
+    else:
+        ring = ring_from_env()
+        if ring is None:
+            parser.error("--workers 0 demande SHARD_NODES")
+    previous = ring_from_env("SHARD_PREVIOUS_NODES")
+
+    if args.plan:
+        afficher_plan(ring, previous)
+        return
+
+    if previous and not os.getenv("SHARD_SECRET"):
+        print("❌ SHARD_SECRET absent : les sessions ne seront pas migrées")
+
+    workers = LocalWorkers(ports).start() if args.workers else None
+    try:
+        print("=" * 50)
+        print(f"🧩 ROUTEUR : {len(ring.nodes)} workers, webhook sur :{args.port}")
+        print("=" * 50)
+        afficher_plan(ring, previous)
+        create_router(ShardRouter(ring, previous)).run(host=args.host, port=args.port, threaded=True)
+    finally:
+        if workers:
+            workers.stop()
+
+
+if __name__ == "__main__":
+    main()
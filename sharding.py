@@ -0,0 +1,82 @@
+"""
+Répartition des utilisateurs entre workers par hachage cohérent
+
+    ring = HashRing(["http://127.0.0.1:5101", "http://127.0.0.1:5102"])
+    ring.node_for(shard_key("whatsapp:+212600000000"))
+
+Un numéro a toujours le même worker tant que l'anneau ne change pas ;
+ajouter un worker à N existants ne déplace qu'environ 1/(N+1) des numéros
+(voir moved()).
+"""
+import bisect
+import hashlib
+import os
+
+# Points par worker sur l'anneau : plus il y en a, plus la répartition est régulière
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "160"))
+
+_SPACE = 2 ** 64
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_key(from_number):
+    """
+    "whatsapp:+2126..." et "+2126..." désignent le même utilisateur
+    """
+    return from_number.split(":", 1)[-1].strip()
+
+
+class HashRing:
+
+    def __init__(self, nodes, vnodes=SHARD_VNODES):
+        self.nodes = list(dict.fromkeys(nodes))
+        if not self.nodes:
+            raise ValueError("Anneau vide : il faut au moins un worker")
+        self.vnodes = vnodes
+
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key):
+        return self._owner(_hash(key))
+
+    def shares(self):
+        """
+        Part de l'espace de hachage attribuée à chaque worker
+        """
+        shares = dict.fromkeys(self.nodes, 0.0)
+        for start, end in self._segments(self._hashes):
+            shares[self._owner(start)] += ((end - start) % _SPACE) / _SPACE
+        return shares
+
+    def moved(self, other):
+        """
+        Part des utilisateurs qui changent de worker en passant de cet anneau à other
+        """
+        bounds = sorted(set(self._hashes) | set(other._hashes))
+        moved = 0
+        for start, end in self._segments(bounds):
+            if self._owner(start) != other._owner(start):
+                moved += (end - start) % _SPACE
+        return moved / _SPACE
+
+    def _owner(self, h):
+        # Premier point strictement après h, en bouclant sur l'anneau
+        return self._owners[bisect.bisect(self._hashes, h) % len(self._hashes)]
+
+    @staticmethod
+    def _segments(bounds):
+        # [début, fin[ : même propriétaire sur tout le segment
+        return [(bounds[i - 1], h) for i, h in enumerate(bounds)]
+
+
+def ring_from_env(name="SHARD_NODES"):
+    """
+    Anneau depuis une liste d'URL séparées par des virgules, None si vide
+    """
+    nodes = [n.strip().rstrip("/") for n in os.getenv(name, "").split(",") if n.strip()]
+    return HashRing(nodes) if nodes else None
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Appels identiques simultanés fusionnés : le premier (leader) fait le
+    travail, les suivants attendent son Future et reçoivent le même résultat.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs), sauf si le même appel est déjà en cours
+        (on attend alors son résultat, ou son exception)
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._leave(key)
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """
+        do() pour une coroutine fn : un appel en cours, lancé depuis un thread
+        ou depuis une boucle asyncio, est partagé par les deux
+        """
+        future, leader = self._join(key)
+        if not leader:
+            # shield : un suiveur annulé n'annule pas l'appel partagé
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._leave(key)
+
+    def attach(self, key):
+        """
+        Future de l'appel en cours pour cette clé, ou None s'il n'y en a pas
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+            return future
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        return future, leader
+
+    def _leave(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "shared": self.shared
+            }
@@ -0,0 +1,405 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from amadeus_tool import find_airport_code
+from cache import TTLCache
+from fast_path import parse_date_fr
+from lazy import per_process
+from metrics import counter, record_stage, span
+from singleflight import SingleFlight
+
+# ========================================
+# MODE D'EXÉCUTION DE LA CREW
+# ========================================
+
+# "parallel"     : vols et hôtels en même temps, pas de manager LLM
+# "hierarchical" : ancien mode, un manager LLM délègue chaque tâche
+CREW_MODES = ("parallel", "hierarchical")
+CREW_MODE = os.getenv("CREW_MODE", "parallel")
+
+
+def is_parallel(mode=None):
+    mode = mode or CREW_MODE
+    if mode not in CREW_MODES:
+        raise ValueError(f"CREW_MODE inconnu : {mode} (attendu : {', '.join(CREW_MODES)})")
+    return mode == "parallel"
+
+
+def crew_options(llm, mode=None):
+    """
+    Arguments Crew selon le mode : le graphe de tâches étant fixe,
+    le mode parallèle se passe du manager LLM
+    """
+    from crewai import Process
+    
+    if is_parallel(mode):
+        return {"process": Process.sequential}
+
+    return {"process": Process.hierarchical, "manager_llm": llm}
+
+
+# ========================================
+# MODÈLE
+# ========================================
+
+# Appels au modèle chronométrés par les événements CrewAI : LLM(...) rend
+# une classe native (AnthropicCompletion), une sous-classe ne serait jamais appelée
+_llm_debuts = {}
+_llm_debuts_lock = threading.Lock()
+
+
+def _llm_debut(source, event):
+    with _llm_debuts_lock:
+        _llm_debuts[event.call_id] = event.timestamp
+
+
+def _llm_fin(source, event):
+    with _llm_debuts_lock:
+        debut = _llm_debuts.pop(event.call_id, None)
+    if debut is not None:
+        record_stage(
+            "llm_call", (event.timestamp - debut).total_seconds(),
+            error=event.type == "llm_call_failed"
+        )
+
+
+@per_process
+def get_llm():
+    """
+    Claude, un par processus (CrewAI importé seulement ici)
+    """
+    from crewai import LLM
+    from crewai.events import LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent, crewai_event_bus
+    
+    # Mêmes fonctions à chaque worker : pas de double inscription après fork
+    crewai_event_bus.on(LLMCallStartedEvent)(_llm_debut)
+    crewai_event_bus.on(LLMCallCompletedEvent)(_llm_fin)
+    crewai_event_bus.on(LLMCallFailedEvent)(_llm_fin)
+    
+    return LLM(
+        model="anthropic/claude-sonnet-4-20250514",
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        base_url=os.getenv("ANTHROPIC_BASE_URL")
+    )
+
+
+# ========================================
+# GABARITS DE CREW
+# ========================================
+
+# Le graphe de tâches ne dépend que de la variante ; les valeurs de la
+# demande sont injectées par kickoff(inputs=...) dans les {placeholders}
+FLIGHT_DETAILS = """
+
+Propose 2 options :
+1. Option économique (vol le moins cher)
+2. Option confort (meilleur rapport qualité/prix)
+
+Pour chaque option indique :
+- Compagnie
+- Horaires
+- Prix
+- Durée"""
+FLIGHT_TEMPLATES = {
+    'aller-retour': "Trouve meilleur vol ALLER-RETOUR de {depart} vers {destination}, dates {date_depart} - {date_retour}, budget {budget}€" + FLIGHT_DETAILS,
+    'aller-simple': "Trouve meilleur vol ALLER SIMPLE de {depart} vers {destination}, date {date_depart}, budget {budget}€" + FLIGHT_DETAILS
+}
+HOTEL_DETAILS = """
+
+Pour chaque hôtel indique :
+- Nom et étoiles
+- Quartier
+- Prix par nuit
+- Avantages"""
+HOTEL_TEMPLATE_PARALLEL = "Trouve 2 hôtels à {destination}, séjour {sejour}, budget restant environ {budget_hotel}€" + HOTEL_DETAILS
+HOTEL_TEMPLATE = "Trouve 2 hôtels à {destination}, coordonnés avec le vol, budget restant environ {budget_hotel}€" + HOTEL_DETAILS
+
+# Package : la vérification de cohérence n'a de sens qu'avec un hôtel
+PACKAGE_TEMPLATE_HOTEL = """Crée un package voyage complet coordonné.
+
+Combine :
+- Meilleur vol trouvé
+- Meilleur hôtel trouvé
+
+Vérifie la cohérence :
+- Hôtel réservé nuit d'arrivée
+- Checkout avant vol retour
+
+Calcule prix total et donne résumé clair."""
+PACKAGE_TEMPLATE = """Crée un package voyage avec le meilleur vol trouvé (sans hôtel).
+
+Calcule prix total et donne résumé clair."""
+
+def crew_variant(state, mode=None):
+    """
+    (parallèle, type de vol, avec hôtel) : une variante = un gabarit
+    """
+    type_vol = 'aller-retour' if state['type_vol'] == 'aller-retour' else 'aller-simple'
+    return (is_parallel(mode), type_vol, bool(state['avec_hotel']))
+
+
+def crew_stages(variant):
+    """
+    Nom de chaque tâche de la variante, dans l'ordre de crew.tasks
+    """
+    return ["flights"] + (["hotel"] if variant[2] else []) + ["package"]
+
+
+def crew_inputs(state):
+    """
+    Valeurs de la demande pour kickoff(inputs=...)
+    """
+    sejour = state['date_depart'] + (f" - {state['date_retour']}" if state.get('date_retour') else "")
+    return {
+        'depart': state['depart'],
+        'destination': state['destination'],
+        'date_depart': state['date_depart'],
+        'date_retour': state.get('date_retour') or "",
+        'sejour': sejour,
+        'budget': state['budget'],
+        'budget_hotel': int(state['budget']) - 200 if state['avec_hotel'] else ""
+    }
+
+
+def build_agents(llm):
+    """
+    Les 3 agents : (trip_planner, flight_finder, hotel_matcher)
+    """
+    from crewai import Agent
+    
+    trip_planner = Agent(
+        role="Organisateur de Voyage Expert",
+        goal="Créer voyage parfait coordonné",
+        backstory="Agent de voyage avec 15 ans d'expérience.",
+        verbose=False,
+        llm=llm,
+        memory=False
+    )
+    
+    flight_finder = Agent(
+        role="Expert Recherche de Vols",
+        goal="Trouver meilleurs vols",
+        backstory="Expert vols avec accès Amadeus API.",
+        verbose=False,
+        llm=llm,
+        memory=False
+    )
+    
+    hotel_matcher = Agent(
+        role="Conseiller Hébergement Expert",
+        goal="Trouver hôtels coordonnés",
+        backstory="Expert hôtellerie mondiale.",
+        verbose=False,
+        llm=llm,
+        memory=False
+    )
+    
+    return trip_planner, flight_finder, hotel_matcher
+
+
+def build_crew(llm, variant):
+    """
+    Crew complète (agents + tâches) pour une variante, sans données de demande
+    """
+    from crewai import Crew, Task
+    
+    parallel, type_vol, avec_hotel = variant
+    trip_planner, flight_finder, hotel_matcher = build_agents(llm)
+    
+    # En parallèle, vols et hôtels tournent en même temps ; le package les attend
+    parallel = parallel and avec_hotel
+    
+    search_flights_task = Task(
+        description=FLIGHT_TEMPLATES[type_vol],
+        expected_output="2 options de vols avec détails complets",
+        agent=flight_finder,
+        async_execution=parallel
+    )
+    
+    tasks = [search_flights_task]
+    
+    if avec_hotel:
+        if parallel:
+            # Les dates suffisent : pas besoin d'attendre le résultat vol
+            search_hotels_task = Task(
+                description=HOTEL_TEMPLATE_PARALLEL,
+                expected_output="2 hôtels avec détails",
+                agent=hotel_matcher,
+                async_execution=True
+            )
+        else:
+            search_hotels_task = Task(
+                description=HOTEL_TEMPLATE,
+                expected_output="2 hôtels avec détails",
+                agent=hotel_matcher,
+                context=[search_flights_task]
+            )
+        tasks.append(search_hotels_task)
+    
+    create_package_task = Task(
+        description=PACKAGE_TEMPLATE_HOTEL if avec_hotel else PACKAGE_TEMPLATE,
+        expected_output="Package voyage complet avec prix total",
+        agent=trip_planner,
+        context=list(tasks)
+    )
+    tasks.append(create_package_task)
+    
+    return Crew(
+        agents=[trip_planner, flight_finder, hotel_matcher],
+        tasks=tasks,
+        verbose=False,
+        memory=False,
+        **crew_options(llm, "parallel" if variant[0] else "hierarchical")
+    )
+
+
+def _stage_callback(on_stage, stage):
+    def callback(output):
+        # Un envoi raté ne doit pas interrompre la Crew
+        try:
+            on_stage(stage, str(getattr(output, "raw", output)))
+        except Exception as e:
+            print(f"❌ Erreur envoi étape {stage} : {e}")
+    return callback
+
+
+class CrewPool:
+    """
+    Crews prêtes à l'emploi, par variante. Chaque worker emprunte une
+    instance isolée (agents compris) et la rend après kickoff.
+    """
+    
+    def __init__(self, llm_factory, max_idle=4):
+        self.llm_factory = llm_factory
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+    
+    def _queue(self, variant):
+        with self._lock:
+            return self._idle.setdefault(variant, queue.LifoQueue(maxsize=self.max_idle))
+    
+    @contextmanager
+    def acquire(self, variant):
+        idle = self._queue(variant)
+        try:
+            crew = idle.get_nowait()
+            with self._lock:
+                self.reused += 1
+        except queue.Empty:
+            crew = build_crew(self.llm_factory(), variant)
+            with self._lock:
+                self.created += 1
+        
+        # Après une erreur, l'instance est dans un état inconnu : on ne la rend pas
+        yield crew
+        
+        try:
+            idle.put_nowait(crew)
+        except queue.Full:
+            pass
+    
+    def kickoff(self, state, mode=None, on_stage=None):
+        """
+        on_stage(étape, texte) : appelé dès qu'une tâche se termine
+        ("flights", "hotel", "package"), pendant que la Crew continue
+        """
+        variant = crew_variant(state, mode)
+        with self.acquire(variant) as crew:
+            # L'instance est à nous seuls pendant kickoff : on branche les callbacks de cette demande
+            if on_stage:
+                for task, stage in zip(crew.tasks, crew_stages(variant)):
+                    task.callback = _stage_callback(on_stage, stage)
+            
+            try:
+                with span("crew_kickoff", mode="parallel" if variant[0] else "hierarchical", hotel=variant[2]):
+                    return crew.kickoff(inputs=crew_inputs(state))
+            finally:
+                if on_stage:
+                    for task in crew.tasks:
+                        task.callback = None
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": sum(q.qsize() for q in self._idle.values()),
+                "variants": len(self._idle)
+            }
+
+
+# ========================================
+# CACHE DES RÉSULTATS DE LA CREW
+# ========================================
+
+# Les prix des vols bougent vite : un package n'est réutilisé que 15 min
+CREW_CACHE_TTL = int(os.getenv("CREW_CACHE_TTL", "900"))
+CREW_CACHE_SIZE = int(os.getenv("CREW_CACHE_SIZE", "256"))
+CREW_CACHE_FILE = os.getenv("CREW_CACHE_FILE")
+
+# Budgets regroupés par tranches (450€ et 499€ -> même package)
+BUDGET_BUCKET = int(os.getenv("CREW_BUDGET_BUCKET", "100"))
+
+crew_cache = TTLCache(maxsize=CREW_CACHE_SIZE, ttl=CREW_CACHE_TTL, path=CREW_CACHE_FILE)
+crew_cache_bypasses = counter("travelbot_crew_cache_bypasses_total", "Packages recalculés malgré le cache (AUTRE)")
+
+# Même demande déjà en cours : les suivants se greffent sur la Crew du premier
+crew_requests = SingleFlight("crew")
+
+
+def _budget_bucket(budget):
+    try:
+        return int(float(str(budget).replace(",", ".")) // BUDGET_BUCKET)
+    except (TypeError, ValueError):
+        return str(budget).strip().lower()
+
+
+def _canonical_city(city):
+    city = (city or "").strip()
+    return find_airport_code(city) or city.lower()
+
+
+def _canonical_date(text):
+    if not text:
+        return None
+    return parse_date_fr(text) or text.strip()
+
+
+def trip_cache_key(state):
+    """
+    Clé canonique d'une demande : "paris " / "Paris" / "CDG" -> même clé
+    """
+    return (
+        _canonical_city(state.get('depart')),
+        _canonical_city(state.get('destination')),
+        _canonical_date(state.get('date_depart')),
+        _canonical_date(state.get('date_retour')) if state.get('type_vol') == 'aller-retour' else None,
+        state.get('type_vol'),
+        bool(state.get('avec_hotel')),
+        _budget_bucket(state.get('budget'))
+    )
+
+
+def get_cached_result(state, bypass=False):
+    """
+    Package déjà calculé pour cette demande, ou None.
+    bypass=True (AUTRE) : on force une nouvelle recherche.
+    """
+    if bypass:
+        crew_cache_bypasses.inc()
+        return None
+
+    return crew_cache.get(trip_cache_key(state))
+
+
+def store_result(state, resultat):
+    crew_cache.set(trip_cache_key(state), str(resultat))
+
+
+def crew_cache_stats():
+    return {**crew_cache.stats(), "bypasses": crew_cache_bypasses.value()}
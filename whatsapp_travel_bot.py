@@ -3,177 +3,282 @@ warnings.filterwarnings('ignore')
 
 from flask import Flask, request
 from twilio.twiml.messaging_response import MessagingResponse
-from twilio.rest import Client
 import os
-from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process, LLM
-from amadeus_api import AmadeusAPI
-from photos_api import PhotosAPI
-import time
+import contextvars
+import hmac
 import threading
+from concurrent.futures import ThreadPoolExecutor
+import json
+from dotenv import load_dotenv
+from amadeus_api import flight_cache, flight_requests
+from amadeus_tool import find_airport_code
+from photos_api import city_photos_future, photo_cache
+import http_transport
+import resilience
+from lazy import per_process
+import metrics
+from metrics import span
+from job_queue import JobQueue, QueueFull
+from session_store import SessionStore
+from cache import TTLCache
+from outbound import pipeline_from_env
+from prefetch import Prefetcher
+from fast_path import FAST_PATH_ENABLED, search_flights_fast, split_flex_window
+from travel_crew import CrewPool, crew_cache, crew_cache_stats, crew_requests, get_cached_result, get_llm, store_result, trip_cache_key
 
 load_dotenv()
 
-app = Flask(__name__)
+# ========================================
+# SINGLETONS PARESSEUX (un par processus)
+# ========================================
 
-# Configuration Twilio
-client = Client(
-    os.getenv("TWILIO_ACCOUNT_SID"),
-    os.getenv("TWILIO_AUTH_TOKEN")
-)
+@per_process
+def get_twilio_client():
+    """Client Twilio (créé au premier envoi)"""
+    from twilio.rest import Client
+    
+    client = Client(
+        os.getenv("TWILIO_ACCOUNT_SID"),
+        os.getenv("TWILIO_AUTH_TOKEN"),
+        http_client=http_transport.twilio_http_client()
+    )
+    
+    # TWILIO_API_BASE : serveur local des benchmarks
+    if os.getenv("TWILIO_API_BASE"):
+        client.api.base_url = os.getenv("TWILIO_API_BASE").rstrip("/")
+    
+    return client
 
-# Configuration Claude
-claude_llm = LLM(
-    model="anthropic/claude-sonnet-4-20250514",
-    api_key=os.getenv("ANTHROPIC_API_KEY")
-)
+@per_process
+def get_crew_pool():
+    """Crews pré-construites, une instance isolée par recherche en cours"""
+    return CrewPool(get_llm, max_idle=SEARCH_WORKERS)
 
 # ========================================
-# CRÉER LES AGENTS
+# ÉTAT CONVERSATIONS
 # ========================================
 
-trip_planner = Agent(
-    role="Organisateur de Voyage Expert",
-    goal="Créer voyage parfait coordonné",
-    backstory="Agent de voyage avec 15 ans d'expérience.",
-    verbose=False,
-    llm=claude_llm,
-    memory=False
+# Sessions persistantes (SQLite) avec un front mémoire borné
+user_states = SessionStore(
+    path=os.getenv("SESSION_DB", "sessions.db"),
+    max_resident=int(os.getenv("SESSION_MAX_RESIDENT", "1000")),
+    ttl=int(os.getenv("SESSION_TTL", str(7 * 86400)))
 )
 
-flight_finder = Agent(
-    role="Expert Recherche de Vols",
-    goal="Trouver meilleurs vols",
-    backstory="Expert vols avec accès Amadeus API.",
-    verbose=False,
-    llm=claude_llm,
-    memory=False
-)
+# ========================================
+# FILE DE RECHERCHES
+# ========================================
 
-hotel_matcher = Agent(
-    role="Conseiller Hébergement Expert",
-    goal="Trouver hôtels coordonnés",
-    backstory="Expert hôtellerie mondiale.",
-    verbose=False,
-    llm=claude_llm,
-    memory=False
-)
+# Recherches (Crew) exécutées en parallèle / en attente max
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+SEARCH_QUEUE_DEPTH = int(os.getenv("SEARCH_QUEUE_DEPTH", "50"))
 
-print("✅ Agents créés")
+search_jobs = JobQueue(workers=SEARCH_WORKERS, max_depth=SEARCH_QUEUE_DEPTH)
 
 # ========================================
-# ÉTAT CONVERSATIONS
+# ENVOIS SORTANTS
 # ========================================
 
-user_states = {}
+def _envoyer_twilio(to_number, body, media_urls):
+    """Envoi Twilio direct (lève en cas d'erreur)"""
+    params = {
+        "from_": os.getenv("TWILIO_WHATSAPP_NUMBER"),
+        "body": body,
+        "to": to_number
+    }
+    if media_urls:
+        params["media_url"] = media_urls
+    
+    with span("twilio_send", kind="media" if media_urls else "text"):
+        get_twilio_client().messages.create(**params)
+
+# Ordre par destinataire, débit limité, retries : les workers n'attendent plus
+outbound = pipeline_from_env(_envoyer_twilio)
+
+# Photos et vols chargés pendant que l'utilisateur répond encore aux questions
+prefetcher = Prefetcher()
+
+# ========================================
+# MÉTRIQUES
+# ========================================
+
+searches_total = metrics.counter("travelbot_searches_total", "Recherches servies, par chemin (fast, cache, crew)")
+
+metrics.gauge(
+    "travelbot_search_jobs", "Recherches par état",
+    lambda: {(("state", k),): v for k, v in search_jobs.stats()['states'].items()}
+)
+metrics.gauge("travelbot_search_queue_depth", "Recherches en attente d'un worker", lambda: search_jobs.stats()['depth'])
+metrics.gauge("travelbot_outbound_waiting", "Messages WhatsApp en file d'envoi", lambda: outbound.stats()['waiting'])
+metrics.gauge("travelbot_crew_cache_entries", "Packages en cache", lambda: crew_cache_stats()['size'])
+
+_caches = {"crew": crew_cache, "flights": flight_cache, "photos": photo_cache}
+
+def _cache_lookups():
+    lookups = {}
+    for name, cache in _caches.items():
+        stats = cache.stats()
+        for result in ("hits", "misses", "stale_hits"):
+            lookups[(("cache", name), ("result", result))] = stats[result]
+    return lookups
+
+metrics.gauge("travelbot_cache_lookups", "Lectures de cache depuis le démarrage, par cache et par issue", _cache_lookups)
+metrics.gauge(
+    "travelbot_upstream_circuit_open", "Disjoncteur ouvert ou en test (1), fermé (0), par service",
+    lambda: {(("upstream", k),): int(v['state'] != "closed") for k, v in resilience.upstream_stats().items()}
+)
+metrics.gauge(
+    "travelbot_upstream_hedged", "Requêtes doublées après le p95, par service",
+    lambda: {(("upstream", k),): v['hedged'] for k, v in resilience.upstream_stats().items()}
+)
+metrics.gauge(
+    "travelbot_prefetch", "Préchargements spéculatifs, par issue",
+    lambda: {(("outcome", k),): prefetcher.stats()[k] for k in ("started", "hits", "wasted", "cancelled", "pending")}
+)
+metrics.gauge(
+    "travelbot_coalesced_requests", "Appels évités par fusion des recherches identiques",
+    lambda: {(("layer", sf.name),): sf.stats()['shared'] for sf in (crew_requests, flight_requests)}
+)
 
 def envoyer_whatsapp(to_number, message):
-    """Envoie message WhatsApp"""
-    try:
-        message = client.messages.create(
-            from_=os.getenv("TWILIO_WHATSAPP_NUMBER"),
-            body=message,
-            to=to_number
-        )
-        return True
-    except Exception as e:
-        print(f"❌ Erreur envoi : {e}")
-        return False
+    """Envoie message WhatsApp (mis en file)"""
+    outbound.send_text(to_number, message)
+    return True
 
 def envoyer_photo(to_number, photo_url, caption=""):
-    """Envoie photo WhatsApp"""
-    try:
-        message = client.messages.create(
-            from_=os.getenv("TWILIO_WHATSAPP_NUMBER"),
-            body=caption,
-            media_url=[photo_url],
-            to=to_number
-        )
-        return True
-    except Exception as e:
-        print(f"❌ Erreur photo : {e}")
-        return False
+    """Envoie photo WhatsApp (mise en file)"""
+    outbound.send_photo(to_number, photo_url, caption)
+    return True
+
+def envoyer_photos(to_number, photos):
+    """Envoie plusieurs photos [(url, légende)], regroupées si possible"""
+    outbound.send_photos(to_number, photos)
+    return True
+
+def lancer_crew(state, mode=None, on_stage=None):
+    """
+    Recherche complète par les agents (vol + hôtel + package)
+    mode : "parallel" ou "hierarchical" (défaut : CREW_MODE)
+    on_stage(étape, texte) : résultat de chaque tâche dès qu'elle se termine
+    """
+    return get_crew_pool().kickoff(state, mode, on_stage)
+
+# Résultats partiels envoyés pendant que la Crew tourne (STREAM_RESULTS=0 pour désactiver)
+STREAM_RESULTS = os.getenv("STREAM_RESULTS", "1") != "0"
+
+ETAPES = {
+    'flights': "✈️ VOLS TROUVÉS",
+    'hotel': "🏨 HÔTEL TROUVÉ"
+}
+
+# Aperçu des vols (Amadeus) calculé pendant que la Crew démarre
+_apercu_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="apercu")
+
+def envoyeur_etapes(from_number, state, apercu=True):
+    """
+    Callback on_stage qui envoie chaque étape une seule fois.
+    Avec hôtel, les vols partent via Amadeus en parallèle de la Crew.
+    Après l'étape "package", plus rien n'est envoyé (aperçu en retard compris).
+    """
+    envoyees = set()
+    lock = threading.Lock()
+    
+    def envoyer_etape(etape, texte):
+        with lock:
+            if etape in envoyees or 'package' in envoyees:
+                return
+            envoyees.add(etape)
+            if etape in ETAPES:
+                envoyer_whatsapp(from_number, f"{ETAPES[etape]}\n\n{texte}\n\n⏳ Je finalise ton package...")
+    
+    def apercu_vols():
+        try:
+            vols = search_flights_fast(state)
+        except Exception as e:
+            print(f"❌ Aperçu vols : {e}")
+            return
+        if vols:
+            envoyer_etape('flights', vols)
+    
+    if apercu and FAST_PATH_ENABLED and state['avec_hotel']:
+        _apercu_executor.submit(contextvars.copy_context().run, apercu_vols)
+    
+    return envoyer_etape
 
-def traiter_recherche(from_number, state):
+# Temps max d'une recherche : chaque appel Amadeus / Unsplash en dessous est borné
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "300"))
+
+def traiter_recherche(from_number, state, autre=False, correlation_id=None):
     """
     Traite la recherche en arrière-plan
+    autre=True (AUTRE) : ignore le package en cache
+    correlation_id : préfixe des logs de chaque étape de cette recherche
     """
+    with metrics.correlation(correlation_id or metrics.new_correlation_id()):
+        with span("search"), resilience.deadline(SEARCH_DEADLINE):
+            _traiter_recherche(from_number, state, autre)
+
+def _traiter_recherche(from_number, state, autre):
     try:
-        # Message d'attente
-        envoyer_whatsapp(
-            from_number,
-            "⚙️ RECHERCHE EN COURS\n\n"
-            "✈️ Je compare 400+ compagnies aériennes\n"
-            f"🏨 Je cherche {'les meilleurs hôtels' if state['avec_hotel'] else 'pas d\'hôtel'}\n"
-            "💰 J'optimise ton budget\n\n"
-            "⏳ Patiente 2-3 minutes...\n"
-            "Je te préviens dès que c'est prêt !"
-        )
+        # Photos destination en parallèle de la recherche (souvent déjà en cache)
+        photos_future = city_photos_future(state['destination'], count=3)
         
-        # Créer tâches selon options
-        if state['type_vol'] == 'aller-retour':
-            flight_desc = f"Trouve meilleur vol ALLER-RETOUR de {state['depart']} vers {state['destination']}, dates {state['date_depart']} - {state['date_retour']}, budget {state['budget']}€"
-        else:
-            flight_desc = f"Trouve meilleur vol ALLER SIMPLE de {state['depart']} vers {state['destination']}, date {state['date_depart']}, budget {state['budget']}€"
+        # Vol seul : Amadeus direct, la Crew ne sert que si l'analyse échoue.
+        # AUTRE : le même top 3 reviendrait (cache vols), on passe à la Crew
+        resultat = None
+        if FAST_PATH_ENABLED and not state['avec_hotel'] and not autre:
+            resultat = search_flights_fast(state)
+            chemin = "fast"
         
-        search_flights_task = Task(
-            description=flight_desc,
-            expected_output="Vol avec prix, horaires, durée",
-            agent=flight_finder
-        )
+        # Même demande récemment : package servi depuis le cache
+        if resultat is None:
+            resultat = get_cached_result(state, bypass=autre)
+            chemin = "cache"
         
-        tasks = [search_flights_task]
-        context_tasks = [search_flights_task]
-        
-        if state['avec_hotel']:
-            search_hotels_task = Task(
-                description=f"Trouve meilleur hôtel à {state['destination']}, coordonné avec vol, budget restant environ {int(state['budget']) - 200}€",
-                expected_output="Hôtel avec prix, localisation",
-                agent=hotel_matcher,
-                context=[search_flights_task]
+        if resultat is None:
+            chemin = "crew"
+            # Message d'attente
+            hotel_txt = "les meilleurs hôtels" if state['avec_hotel'] else "pas d'hôtel"
+            envoyer_whatsapp(
+                from_number,
+                "⚙️ RECHERCHE EN COURS\n\n"
+                "✈️ Je compare 400+ compagnies aériennes\n"
+                f"🏨 Je cherche {hotel_txt}\n"
+                "💰 J'optimise ton budget\n\n"
+                + ("⏳ Je t'envoie les résultats au fur et à mesure !" if STREAM_RESULTS else
+                   "⏳ Patiente 2-3 minutes...\n"
+                   "Je te préviens dès que c'est prêt !")
             )
-            tasks.append(search_hotels_task)
-            context_tasks.append(search_hotels_task)
-        
-        create_package_task = Task(
-            description=f"Crée package complet avec vol {'+ hôtel' if state['avec_hotel'] else 'seulement'} + prix total",
-            expected_output="Package voyage résumé",
-            agent=trip_planner,
-            context=context_tasks
-        )
-        tasks.append(create_package_task)
-        
-        # Crew
-        crew = Crew(
-            agents=[trip_planner, flight_finder, hotel_matcher],
-            tasks=tasks,
-            process=Process.hierarchical,
-            manager_llm=claude_llm,
-            verbose=False,
-            memory=False
-        )
+            
+            # AUTRE : l'aperçu vols serait le même que la première fois
+            on_stage = envoyeur_etapes(from_number, state, apercu=not autre) if STREAM_RESULTS else None
+            if autre:
+                resultat = calculer_package(state, on_stage)
+            else:
+                # Même demande lancée en même temps par un autre worker : une seule Crew
+                resultat = crew_requests.do(trip_cache_key(state), calculer_package, state, on_stage)
+            
+            # Suiveur d'une autre Crew : ses étapes ne passent pas par on_stage
+            if on_stage:
+                on_stage('package', resultat)
         
-        # Lancer
-        resultat = crew.kickoff()
+        searches_total.inc(path=chemin)
         
-        # Envoyer résultat
+        # Envoyer résultat (découpé en plusieurs messages si trop long)
         envoyer_whatsapp(
             from_number,
-            f"✅ PACKAGE TROUVÉ !\n\n{str(resultat)[:1200]}\n\n"
+            f"✅ PACKAGE TROUVÉ !\n\n{resultat}\n\n"
             "📸 Photos en envoi..."
         )
         
         # Envoyer photos destination
-        photos_api = PhotosAPI()
-        photos = photos_api.search_city_photos(state['destination'], count=3)
+        with span("photos_wait"):
+            photos = photos_future.result()
         
-        for i, photo in enumerate(photos[:3], 1):
-            envoyer_photo(
-                from_number,
-                photo['url'],
-                f"📸 Photo {i}/3 - {state['destination']}"
-            )
-            time.sleep(1)  # Pause entre photos
+        envoyer_photos(from_number, [
+            (photo['url'], f"📸 Photo {i}/3 - {state['destination']}")
+            for i, photo in enumerate(photos[:3], 1)
+        ])
         
         # Menu final
         envoyer_whatsapp(
@@ -184,36 +289,155 @@ def traiter_recherche(from_number, state):
             "🆕 NOUVEAU - Autre destination"
         )
         
-        state['step'] = 'menu'
-        state['resultat'] = str(resultat)
+        # L'utilisateur a pu taper NOUVEAU pendant la recherche
+        with user_states.transaction(from_number) as current:
+            if current.get('step') == 'waiting':
+                current['step'] = 'menu'
+                current['resultat'] = str(resultat)
         
     except Exception as e:
         print(f"❌ Erreur recherche: {e}")
-        envoyer_whatsapp(
-            from_number,
-            f"❌ Erreur lors de la recherche.\n\nTape NOUVEAU pour réessayer"
+        signaler_erreur(from_number)
+        raise
+
+def signaler_erreur(from_number):
+    envoyer_whatsapp(
+        from_number,
+        "❌ Erreur lors de la recherche.\n\nTape NOUVEAU pour réessayer"
+    )
+
+def calculer_package(state, on_stage=None):
+    """
+    Crew puis cache : le package est en cache avant que les suiveurs ne soient réveillés
+    """
+    resultat = lancer_crew(state, on_stage=on_stage)
+    store_result(state, resultat)
+    return resultat
+
+def rejoindre_recherche(from_number, state, correlation_id, future):
+    """
+    Crew du leader terminée : la recherche du suiveur est servie par le cache
+    (ou relancée si le leader a échoué)
+    """
+    erreur = future.exception()
+    if erreur is not None:
+        print(f"🔁 [{correlation_id}] Recherche identique échouée ({erreur}), relancée pour {from_number}")
+    
+    try:
+        search_jobs.submit(traiter_recherche, from_number, state, False, correlation_id, owner=from_number)
+    except QueueFull:
+        signaler_erreur(from_number)
+
+def lancer_recherche(from_number, state, msg, autre=False):
+    """
+    Met la recherche en file et répond tout de suite
+    """
+    correlation_id = metrics.new_correlation_id()
+    prefetcher.consume(from_number, state)
+    
+    # Même package déjà en calcul : on attend le premier sans occuper de worker
+    partage = None if autre else crew_requests.attach(trip_cache_key(state))
+    if partage is not None:
+        demande = dict(state)
+        partage.add_done_callback(
+            lambda future: rejoindre_recherche(from_number, demande, correlation_id, future)
+        )
+        print(f"🔎 [{correlation_id}] {from_number} rejoint une recherche identique en cours")
+        
+        msg.body(
+            "🚀 Recherche identique déjà en cours !\n\n"
+            "⏳ Je t'envoie le package dès qu'il est prêt."
+        )
+        state['step'] = 'waiting'
+        return
+    
+    try:
+        job = search_jobs.submit(traiter_recherche, from_number, dict(state), autre, correlation_id, owner=from_number)
+    except QueueFull as e:
+        msg.body(
+            "🚦 Beaucoup de demandes en ce moment !\n\n"
+            f"⏳ {e.depth} recherches sont déjà en attente.\n"
+            "Tape OUI dans quelques minutes pour relancer."
+        )
+        state['step'] = 'confirm'
+        return
+    
+    print(f"🔎 [{correlation_id}] Recherche #{job.id} pour {from_number} ({job.position} devant)")
+    
+    if job.position:
+        msg.body(
+            "🚀 Recherche enregistrée !\n\n"
+            f"⏳ Tu es n°{job.position} dans la file, "
+            "je lance ta recherche dès qu'une place se libère."
         )
+    elif FAST_PATH_ENABLED and not state['avec_hotel']:
+        msg.body("🚀 Recherche lancée ! Résultats dans quelques secondes...")
+    else:
+        msg.body("🚀 Recherche lancée ! Patiente 2-3 min...")
+    
+    state['step'] = 'waiting'
 
 # ========================================
 # WEBHOOK WHATSAPP
 # ========================================
 
-@app.route("/whatsapp", methods=['POST'])
+# Twilio rejoue le webhook si la réponse tarde : même MessageSid -> même réponse
+WEBHOOK_REPLAY_TTL = int(os.getenv("WEBHOOK_REPLAY_TTL", "3600"))
+WEBHOOK_REPLAY_SIZE = int(os.getenv("WEBHOOK_REPLAY_SIZE", "10000"))
+
+webhook_replies = TTLCache(maxsize=WEBHOOK_REPLAY_SIZE, ttl=WEBHOOK_REPLAY_TTL)
+webhook_duplicates = metrics.counter("travelbot_webhook_duplicates_total", "Webhooks rejoués par Twilio (MessageSid déjà traité)")
+
 def whatsapp_webhook():
     """
     Reçoit messages WhatsApp
     """
     incoming_msg = request.values.get('Body', '').strip()
     from_number = request.values.get('From', '')
+    message_sid = request.values.get('MessageSid', '')
     
     print(f"\n📱 Message de {from_number}: {incoming_msg}")
     
+    # Lecture-modification-écriture atomique de la session
+    with user_states.transaction(from_number) as state:
+        # Sous le verrou de l'utilisateur : un rejeu arrivé pendant le
+        # traitement de l'original attend sa réponse au lieu de relancer
+        if message_sid:
+            reponse = webhook_replies.get(message_sid)
+            if reponse is not None:
+                webhook_duplicates.inc(step=state.get('step', 'nouveau'))
+                print(f"🔁 {message_sid} déjà traité : réponse rejouée")
+                return reponse
+        
+        step = state.get('step', 'nouveau')
+        with span("webhook", step=step):
+            reponse = traiter_message(from_number, incoming_msg, state)
+        
+        # Seulement pendant les questions : après OUI, la vraie recherche prend le relais
+        if state.get('step') != step and state.get('step') not in ('waiting', 'menu'):
+            prefetcher.on_step(from_number, state)
+        
+        if message_sid:
+            webhook_replies.set(message_sid, reponse)
+        
+        return reponse
+
+def ville_inconnue(saisie, exemples):
+    return (
+        f"❓ Je ne trouve pas d'aéroport pour « {saisie} ».\n\n"
+        f"Réessaie avec le nom de la ville ou son code (ex : {exemples})"
+    )
+
+def traiter_message(from_number, incoming_msg, state):
+    """
+    Machine à états de la conversation (state est modifié sur place)
+    """
     resp = MessagingResponse()
     incoming_lower = incoming_msg.lower()
     
     # 🆕 MESSAGE D'INTRODUCTION AUTOMATIQUE
-    if from_number not in user_states:
-        user_states[from_number] = {'step': 'intro'}
+    if 'step' not in state:
+        state['step'] = 'intro'
         
         msg = resp.message()
         msg.body(
@@ -229,8 +453,6 @@ def whatsapp_webhook():
         )
         return str(resp)
     
-    state = user_states[from_number]
-    
     # Commande NOUVEAU
     if 'nouveau' in incoming_lower or state['step'] == 'intro':
         state['step'] = 'destination'
@@ -245,6 +467,10 @@ def whatsapp_webhook():
     
     # Étape 1 : Destination
     if state['step'] == 'destination':
+        if not find_airport_code(incoming_msg):
+            resp.message().body(ville_inconnue(incoming_msg, "Paris, New York, Londres, Tokyo..."))
+            return str(resp)
+        
         state['destination'] = incoming_msg.title()
         state['step'] = 'depart'
         
@@ -257,6 +483,10 @@ def whatsapp_webhook():
     
     # Étape 2 : Ville départ
     elif state['step'] == 'depart':
+        if not find_airport_code(incoming_msg):
+            resp.message().body(ville_inconnue(incoming_msg, "Casablanca, Fez, Marrakech..."))
+            return str(resp)
+        
         state['depart'] = incoming_msg.title()
         state['step'] = 'type_vol'
         
@@ -281,7 +511,8 @@ def whatsapp_webhook():
                 "✅ Aller-retour sélectionné\n\n"
                 "📅 Dates de voyage ?\n"
                 "Format : JJ/MM - JJ/MM\n"
-                "Exemple : 28/01 - 30/01"
+                "Exemple : 28/01 - 30/01\n"
+                "💡 Dates flexibles : 28/01 - 30/01 ±3"
             )
         elif '2' in incoming_lower or 'simple' in incoming_lower:
             state['type_vol'] = 'aller-simple'
@@ -292,7 +523,8 @@ def whatsapp_webhook():
                 "✅ Aller simple sélectionné\n\n"
                 "📅 Date de départ ?\n"
                 "Format : JJ/MM\n"
-                "Exemple : 28/01"
+                "Exemple : 28/01\n"
+                "💡 Dates flexibles : 28/01 ±3"
             )
         else:
             msg = resp.message()
@@ -301,7 +533,8 @@ def whatsapp_webhook():
     # Étape 4a : Dates aller-retour
     elif state['step'] == 'dates_ar':
         try:
-            dates = incoming_msg.split('-')
+            texte, state['flex'] = split_flex_window(incoming_msg)
+            dates = texte.split('-')
             state['date_depart'] = dates[0].strip()
             state['date_retour'] = dates[1].strip()
             state['step'] = 'avec_hotel'
@@ -325,7 +558,8 @@ def whatsapp_webhook():
     
     # Étape 4b : Date aller simple
     elif state['step'] == 'date_as':
-        state['date_depart'] = incoming_msg.strip()
+        texte, state['flex'] = split_flex_window(incoming_msg)
+        state['date_depart'] = texte.strip()
         state['date_retour'] = None
         state['step'] = 'avec_hotel'
         
@@ -389,13 +623,9 @@ def whatsapp_webhook():
     elif state['step'] == 'confirm':
         if 'oui' in incoming_lower:
             msg = resp.message()
-            msg.body("🚀 Recherche lancée ! Patiente 2-3 min...")
             
             # Lancer recherche en arrière-plan
-            thread = threading.Thread(target=traiter_recherche, args=(from_number, state))
-            thread.start()
-            
-            state['step'] = 'waiting'
+            lancer_recherche(from_number, state, msg)
         else:
             msg = resp.message()
             msg.body("❌ Recherche annulée.\n\nTape NOUVEAU pour recommencer")
@@ -418,13 +648,10 @@ def whatsapp_webhook():
         
         elif 'autre' in incoming_lower:
             msg = resp.message()
-            msg.body("🔄 Nouvelle recherche lancée...")
-            state['step'] = 'confirm'
-            thread = threading.Thread(target=traiter_recherche, args=(from_number, state))
-            thread.start()
+            lancer_recherche(from_number, state, msg, autre=True)
         
         elif 'nouveau' in incoming_lower:
-            del user_states[from_number]
+            state.clear()
             msg = resp.message()
             msg.body(
                 "🆕 Nouvelle recherche !\n\n"
@@ -440,15 +667,152 @@ def whatsapp_webhook():
     
     return str(resp)
 
-@app.route("/status", methods=['GET'])
 def status():
-    return "✅ Travel Bot actif !"
+    lignes = ["✅ Travel Bot actif !"]
+    
+    for host, stats in http_transport.pool_stats().items():
+        lignes.append(
+            f"🔌 {host} : {stats['requests']} requêtes, "
+            f"{stats['hits']} réutilisées, {stats['misses']} connexions"
+        )
+    
+    envois = outbound.stats()
+    lignes.append(
+        f"📤 Envois : {envois['sent']} partis, {envois['waiting']} en file, "
+        f"{envois['retried']} relances, {envois['failed']} échecs, {envois['merged']} photos regroupées"
+    )
+    
+    cache = crew_cache_stats()
+    lignes.append(
+        f"📦 Cache packages : {cache['hits']} hits / {cache['misses']} miss "
+        f"({cache['hit_rate']:.0%}), {cache['size']}/{cache['maxsize']} entrées, "
+        f"{cache['evictions']} évincés, {cache['bypasses']} AUTRE"
+    )
+    
+    for upstream, etat in resilience.upstream_stats().items():
+        p95 = f"{etat['p95'] * 1000:.0f} ms" if etat['p95'] is not None else "?"
+        lignes.append(
+            f"🛡️ {upstream} : {etat['state']}, p95 {p95}, {etat['opened']} coupures, "
+            f"{etat['rejected']} refus, {etat['hedged']} doublées ({etat['hedge_wins']} gagnées)"
+        )
+    
+    rejeux = webhook_replies.stats()
+    lignes.append(
+        f"🔁 Webhooks rejoués : {rejeux['hits']} doublons ignorés, {rejeux['size']}/{rejeux['maxsize']} MessageSid gardés"
+    )
+    
+    prechargement = prefetcher.stats()
+    lignes.append(
+        f"🔮 Préchargement : {prechargement['hits']} utiles, {prechargement['wasted']} perdus, "
+        f"{prechargement['cancelled']} annulés ({prechargement['hit_rate']:.0%}), "
+        f"{prechargement['pending']} en attente"
+    )
+    
+    for partage in (crew_requests, flight_requests):
+        vols = partage.stats()
+        lignes.append(
+            f"🔗 Fusion {partage.name} : {vols['in_flight']} en cours, "
+            f"{vols['leaders']} lancées, {vols['shared']} partagées"
+        )
+    
+    crews = get_crew_pool().stats()
+    lignes.append(
+        f"🤖 Crews : {crews['created']} construites, {crews['reused']} réutilisées, "
+        f"{crews['idle']} disponibles ({crews['variants']} variantes)"
+    )
+    
+    jobs = search_jobs.stats()
+    states = jobs['states']
+    lignes.append(
+        f"🧵 Recherches : {states['running']} en cours, {jobs['depth']}/{jobs['max_depth']} en attente, "
+        f"{states['done']} terminées, {states['failed']} échouées, {jobs['rejected']} refusées "
+        f"({jobs['workers']} workers)"
+    )
+    for job in jobs['recent']:
+        lignes.append(f"   #{job.id} …{job.owner[-4:]} : {job.state}")
+    
+    return "\n".join(lignes), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+def metrics_endpoint():
+    """
+    Histogrammes et compteurs au format Prometheus
+    """
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+# ========================================
+# RÉÉQUILIBRAGE (shard_router.py)
+# ========================================
+
+# Secret partagé avec le routeur ; sans lui, pas de routes /_shard
+SHARD_SECRET = os.getenv("SHARD_SECRET", "")
+
+def _shard_autorise():
+    return bool(SHARD_SECRET) and hmac.compare_digest(request.headers.get("X-Shard-Secret", ""), SHARD_SECRET)
+
+def shard_handoff():
+    """
+    Cède la session d'un utilisateur qui change de worker (409 pendant sa recherche)
+    """
+    if not _shard_autorise():
+        return "", 403
+    
+    from_number = request.values.get('From', '')
+    with user_states.transaction(from_number) as state:
+        # La recherche en cours écrira le résultat ici : l'utilisateur reste
+        if state.get('step') == 'waiting':
+            return "", 409
+        session = dict(state)
+        state.clear()
+    
+    prefetcher.consume(from_number, {})
+    print(f"📦 Session …{from_number[-4:]} cédée à un autre worker")
+    return json.dumps(session, ensure_ascii=False), 200, {"Content-Type": "application/json; charset=utf-8"}
+
+def shard_adopt():
+    """
+    Reprend une session cédée ; une session déjà présente ici n'est pas écrasée
+    """
+    if not _shard_autorise():
+        return "", 403
+    
+    from_number = request.values.get('From', '')
+    session = json.loads(request.values.get('session') or "{}")
+    with user_states.transaction(from_number) as state:
+        if not state:
+            state.update(session)
+    
+    return "", 204
+
+# ========================================
+# APPLICATION
+# ========================================
+
+def create_app():
+    """
+    Fabrique Flask : rien de lourd n'est construit ici (Twilio, LLM, crews
+    et CrewAI sont créés au premier besoin, dans chaque worker).
+    
+    Un processus par shard : pour plusieurs processus, passer par
+    shard_router.py (un numéro reste toujours sur le même processus).
+    
+    gunicorn -w 1 --threads 16 'whatsapp_travel_bot:create_app()'
+    """
+    app = Flask(__name__)
+    app.add_url_rule("/whatsapp", view_func=whatsapp_webhook, methods=['POST'])
+    app.add_url_rule("/status", view_func=status, methods=['GET'])
+    app.add_url_rule("/metrics", view_func=metrics_endpoint, methods=['GET'])
+    if SHARD_SECRET:
+        app.add_url_rule("/_shard/handoff", view_func=shard_handoff, methods=['POST'])
+        app.add_url_rule("/_shard/adopt", view_func=shard_adopt, methods=['POST'])
+    return app
 
 # ========================================
 # LANCEMENT
 # ========================================
 
 if __name__ == "__main__":
+    app = create_app()
+    
     print("="*50)
     print("✈️ TRAVEL BOT WHATSAPP V2 DÉMARRÉ")
     print("="*50)